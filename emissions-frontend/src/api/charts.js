@@ -0,0 +1,13 @@
+import axios from 'axios';
+
+// The chart list is keyset-paginated ({ next, results }); follow `next` to the end.
+export async function fetchAllCharts(url, params = {}) {
+  const charts = [];
+  let res = await axios.get(url, { params });
+  charts.push(...res.data.results);
+  while (res.data.next) {
+    res = await axios.get(res.data.next);
+    charts.push(...res.data.results);
+  }
+  return charts;
+}
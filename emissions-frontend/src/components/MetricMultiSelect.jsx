@@ -1,22 +1,34 @@
-import React from 'react';
-import Select from 'react-select';
+import React, { useRef } from 'react';
+import AsyncSelect from 'react-select/async';
+import axios from 'axios';
 
-export default function MetricMultiSelect({ indicators, value, onChange }) {
-  const options = indicators.map(ind => ({
-    value: ind.code,
-    label: `${ind.code} — ${ind.name}${ind.unit ? ` (${ind.unit})` : ''}`
-  }));
+const API = import.meta.env.VITE_API_BASE_URL;
 
-  const selectedOpts = options.filter(o => value.includes(o.value));
+const toOption = ind => ({
+  value: ind.code,
+  label: `${ind.code} — ${ind.name}${ind.unit ? ` (${ind.unit})` : ''}`
+});
+
+// Indicators are searched server-side (/api/autocomplete/) as the user types
+export default function MetricMultiSelect({ value, onChange }) {
+  const known = useRef({});
+
+  const loadOptions = q =>
+    axios.get(`${API}/api/autocomplete/`, { params: { q, kind: 'indicator', limit: 20 } })
+      .then(res => res.data.results.map(ind => (known.current[ind.code] = toOption(ind))))
+      .catch(() => []);
+
+  const selectedOpts = value.map(code => known.current[code] || { value: code, label: code });
 
   return (
     <div style={{ minWidth: 280, width: '100%', maxWidth: 700 }}>
-      <Select
+      <AsyncSelect
         isMulti
-        options={options}
+        cacheOptions
+        loadOptions={loadOptions}
         value={selectedOpts}
         onChange={(opts) => onChange((opts || []).map(o => o.value))}
-        placeholder="Select metrics…"
+        placeholder="Search metrics…"
         classNamePrefix="select"
       />
     </div>
@@ -7,6 +7,7 @@ import CountrySelector    from '../components/CountrySelector';
 import YearRangeSlider    from '../components/YearRangeSlider';
 import EmissionsChart     from '../components/EmissionsChart';
 import MetricMultiSelect  from '../components/MetricMultiSelect';
+import { fetchAllCharts } from '../api/charts';
 
 const API = import.meta.env.VITE_API_BASE_URL;
 
@@ -19,7 +20,6 @@ export default function ChartBuilderPage({ isAuth }) {
   const [years, setYears] = useState([]);
   const [selectedYear, setSelectedYear] = useState('');
 
-  const [allIndicators, setAllIndicators] = useState([]);
   const [selectedMetrics, setSelectedMetrics] = useState(['co2']);
   const [tsData, setTsData] = useState([]);
   const [unitsMap, setUnitsMap] = useState({});
@@ -40,16 +40,6 @@ export default function ChartBuilderPage({ isAuth }) {
   const [saveError, setSaveError] = useState(null);
   const [justSavedId, setJustSavedId] = useState(null);
 
-  // indicators
-  useEffect(() => {
-    axios.get(`${API}/api/indicators/`)
-      .then(res => {
-        const list = Array.isArray(res.data) ? res.data : res.data.results || res.data;
-        setAllIndicators(list);
-      })
-      .catch(console.error);
-  }, []);
-
   // countries
   useEffect(() => {
     axios.get(`${API}/api/countries/`)
@@ -65,8 +55,8 @@ export default function ChartBuilderPage({ isAuth }) {
   // list my charts
   const refreshMyCharts = useCallback(() => {
     if (!isAuth) { setMyCharts([]); return; }
-    axios.get(`${API}/api/charts/?mine=1`)
-      .then(res => setMyCharts(Array.isArray(res.data) ? res.data : res.data.results || []))
+    fetchAllCharts(`${API}/api/charts/`, { mine: 1 })
+      .then(setMyCharts)
       .catch(() => setMyCharts([]));
   }, [isAuth]);
 
@@ -348,7 +338,6 @@ export default function ChartBuilderPage({ isAuth }) {
       {/* Metrics */}
       <div style={{ marginTop:'1rem', marginBottom:'1rem', width:'100%', display:'flex', gap:'0.5rem', alignItems:'center', justifyContent:'center', flexWrap:'wrap' }}>
         <MetricMultiSelect
-          indicators={allIndicators}
           value={selectedMetrics}
           onChange={setSelectedMetrics}
         />
@@ -5,23 +5,28 @@ import EmissionsChart from '../components/EmissionsChart';
 
 export default function ChartViewPage() {
   const { id } = useParams();
-  const [config, setConfig] = useState(null);
+  const [chart, setChart] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    axios.get(`/api/charts/${id}/`)
-      .then(res => setConfig(res.data.config))
+    // Config and series in one request (GET /api/charts/:id/data/)
+    axios.get(`/api/charts/${id}/data/`)
+      .then(res => setChart(res.data))
       .catch(console.error)
       .finally(() => setLoading(false));
   }, [id]);
 
   if (loading) return <p>Loading chart…</p>;
-  if (!config) return <p>Chart not found.</p>;
+  if (!chart) return <p>Chart not found.</p>;
 
   return (
     <div style={{ padding: '1rem', maxWidth: 900, margin: 'auto' }}>
       <h1>Viewing: {`Chart #${id}`}</h1>
-      <EmissionsChart config={config} />
+      <EmissionsChart
+        data={chart.data}
+        seriesKeys={chart.config.metrics}
+        unitsMap={chart.units}
+      />
     </div>
   );
 }
@@ -1,14 +1,14 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import axios from 'axios';
+import { fetchAllCharts } from '../api/charts';
 
 export default function SavedChartsPage() {
   const [charts, setCharts] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    axios.get('/api/charts/')
-      .then(res => setCharts(res.data))
+    fetchAllCharts('/api/charts/')
+      .then(setCharts)
       .catch(console.error)
       .finally(() => setLoading(false));
   }, []);
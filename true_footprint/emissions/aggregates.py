@@ -0,0 +1,174 @@
+"""
+Server-side aggregates over one indicator, returned as compact arrays.
+
+Sums, means and rankings are pushed into SQL. Percentiles, CAGR and
+rolling means are computed with NumPy on a dense [country x year] matrix
+built from one values_list() query. With the in-process cube enabled
+(cube.py) every stat works on a matrix sliced from the cube instead.
+"""
+import numpy as np
+from django.db.models import Avg, Max, Sum
+
+from .cube import get_cube, to_list
+from .models import Observation
+
+STATS = ("sum", "mean", "rank", "percentile", "cagr", "rolling")
+
+
+def indicator_rows(code, year_min=None, year_max=None, isos=None):
+    qs = Observation.objects.filter(indicator__code=code)
+    if year_min is not None:
+        qs = qs.filter(year__gte=year_min)
+    if year_max is not None:
+        qs = qs.filter(year__lte=year_max)
+    if isos:
+        qs = qs.filter(country__iso_code__in=isos)
+    return qs
+
+
+def to_matrix(rows, contiguous=False):
+    """
+    (iso, year, value) rows -> (isos, years, matrix) with NaN for missing
+    cells. ``contiguous`` fills every year between the first and last so
+    windows along the year axis mean calendar years.
+    """
+    if not rows:
+        return [], [], np.empty((0, 0))
+    isos, years, values = zip(*rows)
+    iso_axis, iso_idx = np.unique(np.array(isos), return_inverse=True)
+    years = np.array(years)
+    if contiguous:
+        year_axis = np.arange(years.min(), years.max() + 1)
+        year_idx = years - years.min()
+    else:
+        year_axis, year_idx = np.unique(years, return_inverse=True)
+    matrix = np.full((len(iso_axis), len(year_axis)), np.nan)
+    matrix[iso_idx, year_idx] = values
+    return iso_axis.tolist(), year_axis.tolist(), matrix
+
+
+def indicator_matrix(code, year_min=None, year_max=None, isos=None, contiguous=False):
+    """(isos, years, matrix) for one indicator, from the cube when enabled."""
+    cube = get_cube()
+    if cube is not None:
+        return cube.indicator_matrix(code, year_min, year_max, isos, contiguous)
+    qs = indicator_rows(code, year_min, year_max, isos)
+    return to_matrix(list(qs.values_list("country__iso_code", "year", "value")), contiguous)
+
+
+def aggregate(stat, code, year_min=None, year_max=None, isos=None, year=None, top=None, window=5, q=()):
+    """
+    Dispatch one of STATS. ``year`` (rank) defaults to the latest year with
+    data; ``top`` limits rank (default 20) and cagr (default: no limit).
+    """
+    if stat not in STATS:
+        raise ValueError(f"stat must be one of {', '.join(STATS)}.")
+
+    if stat in ("sum", "mean", "rank") and get_cube() is None:
+        qs = indicator_rows(code, year_min, year_max, isos)
+        if stat == "rank":
+            if year is None:
+                year = qs.aggregate(latest=Max("year"))["latest"]
+            return ranking(qs, year, top or 20)
+        return yearly(qs, Sum if stat == "sum" else Avg)
+
+    data = indicator_matrix(code, year_min, year_max, isos, contiguous=(stat == "rolling"))
+    if stat == "sum":
+        return yearly_matrix(data, np.nansum)
+    if stat == "mean":
+        return yearly_matrix(data, np.nanmean)
+    if stat == "rank":
+        return ranking_matrix(data, year, top or 20)
+    if stat == "percentile":
+        return percentiles(data, q)
+    if stat == "cagr":
+        return cagr(data, top)
+    return rolling_mean(data, window)
+
+
+def yearly(qs, fn):
+    rows = qs.values("year").annotate(v=fn("value")).order_by("year").values_list("year", "v")
+    years, values = zip(*rows) if rows else ((), ())
+    return {"years": list(years), "values": list(values)}
+
+
+def ranking(qs, year, top):
+    rows = qs.filter(year=year).order_by("-value").values_list("country__iso_code", "value")[:top]
+    countries, values = zip(*rows) if rows else ((), ())
+    return {"year": year, "countries": list(countries), "values": list(values)}
+
+
+def yearly_matrix(data, fn):
+    _, years, matrix = data
+    return {"years": years, "values": fn(matrix, axis=0).tolist() if years else []}
+
+
+def ranking_matrix(data, year, top):
+    isos, years, matrix = data
+    if year is None and years:
+        year = years[-1]
+    if year not in years:
+        return {"year": year, "countries": [], "values": []}
+    column = matrix[:, years.index(year)]
+    order = [i for i in np.argsort(-column, kind="stable") if not np.isnan(column[i])][:top]
+    return {"year": year, "countries": [isos[i] for i in order], "values": column[order].tolist()}
+
+
+def percentiles(data, q):
+    isos, years, matrix = data
+    if not years:
+        return {"years": [], "percentiles": {}}
+    result = np.nanpercentile(matrix, q, axis=0)
+    return {"years": years, "percentiles": {f"{p:g}": to_list(row) for p, row in zip(q, result)}}
+
+
+def cagr(data, top=None):
+    """
+    Compound annual growth rate per country between its first and last
+    observed year in range; countries without two positive endpoints drop out.
+    """
+    isos, years, matrix = data
+    if not isos:
+        return {"countries": [], "values": [], "start_years": [], "end_years": []}
+    present = ~np.isnan(matrix)
+    has_any = present.any(axis=1)
+    first = np.argmax(present, axis=1)
+    last = matrix.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    rows = np.arange(len(isos))
+    start, end = matrix[rows, first], matrix[rows, last]
+    year_axis = np.array(years)
+    span = year_axis[last] - year_axis[first]
+
+    ok = has_any & (span > 0) & (start > 0) & (end > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(ok, (end / start) ** (1.0 / np.where(span > 0, span, 1)) - 1.0, np.nan)
+
+    order = [i for i in np.argsort(-rate, kind="stable") if ok[i]][:top]
+    return {
+        "countries": [isos[i] for i in order],
+        "values": to_list(rate[order]),
+        "start_years": year_axis[first[order]].tolist(),
+        "end_years": year_axis[last[order]].tolist(),
+    }
+
+
+def rolling_mean(data, window):
+    """
+    Trailing ``window``-year mean per country over the values present in each
+    window; ``data`` must have a contiguous year axis.
+    """
+    isos, years, matrix = data
+    if not isos:
+        return {"years": [], "window": window, "countries": {}}
+    present = ~np.isnan(matrix)
+    sums = np.cumsum(np.where(present, matrix, 0.0), axis=1)
+    counts = np.cumsum(present, axis=1)
+    sums[:, window:] -= sums[:, :-window].copy()
+    counts[:, window:] -= counts[:, :-window].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return {
+        "years": years,
+        "window": window,
+        "countries": {iso: to_list(row) for iso, row in zip(isos, means)},
+    }
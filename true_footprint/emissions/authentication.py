@@ -0,0 +1,48 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# What the cache keeps about a user: enough for permissions and owner
+# filters, never the password hash.
+USER_FIELDS = ("pk", "username", "is_active", "is_staff", "is_superuser")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that remembers which user an access token resolved
+    to, so repeat calls with the same token skip signature verification and
+    the User query. Entries live for AUTH_CACHE_TTL seconds and never past
+    the token's expiry; a deactivated user or changed password takes effect
+    once the entry lapses.
+
+    Only the USER_FIELDS are cached; a hit returns an unsaved user built
+    from them (fine for ``request.user.pk`` / owner filters, but call
+    ``refresh_from_db()`` before reading anything else). The token itself
+    is not cached either, as it carries the signing key: a hit re-decodes
+    the already verified token without checking the signature again.
+    """
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        key = f"emissions:auth:{hashlib.sha256(raw_token).hexdigest()}"
+        cached = cache.get(key)
+        if cached is not None:
+            token_class, fields = cached
+            user = self.user_model(**{f: v for f, v in fields.items() if f != "pk"})
+            user.pk = fields["pk"]
+            return user, token_class(raw_token, verify=False)
+
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_user(validated_token)
+        ttl = min(getattr(settings, "AUTH_CACHE_TTL", 60), int(validated_token["exp"] - time.time()))
+        if ttl > 0:
+            cache.set(key, (type(validated_token), {f: getattr(user, f) for f in USER_FIELDS}), ttl)
+        return user, validated_token
@@ -0,0 +1,272 @@
+"""
+Benchmark suite for the emissions API (``manage.py benchmark_api``).
+
+seed() builds a synthetic OWID-shaped dataset: a wide CSV pushed through
+the real loader (its throughput is the ``loader`` result), plus emissions,
+populations, summaries, saved charts and a dashboard of them. measure()
+then requests every endpoint in emissions/urls.py (auth-check and the
+dashboards as the seeded user, with a bearer token) and records, per
+endpoint, the query count and payload size of a cold request, p50/p95
+latency with the response cache (and autocomplete's memo) cleared before
+each request, and p50 with a warm cache.
+
+Results are one JSON document, so runs can be stored and compared
+(compare()).
+"""
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+import django
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .charts import config_hash
+from .cube import reset_cube
+from .loaders import SOURCES, BulkLoader
+from .models import Chart, Country, Dashboard, DashboardChart, Emission, Indicator, Observation, Population
+from .search import clear_memo, reset_index
+from .summaries import refresh_summaries
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+USERNAME = "benchmark"  # owns the seeded charts and dashboard
+# Routes requested as USERNAME, with a bearer token
+AUTHENTICATED = ("/api/auth-check/", "/api/dashboards/")
+
+
+def iso_code(i):
+    return LETTERS[i // 676 % 26] + LETTERS[i // 26 % 26] + LETTERS[i % 26]
+
+
+def write_csv(path, countries, indicators, years, fill=0.7, seed=0):
+    """Wide OWID-layout CSV with about ``fill`` of the cells present."""
+    rng = np.random.default_rng(seed)
+    n_rows = countries * len(years)
+    values = rng.lognormal(2.0, 1.5, size=(n_rows, indicators)).round(3)
+    values[rng.random((n_rows, indicators)) > fill] = np.nan
+    frame = pd.DataFrame(values, columns=[f"ind_{i:03d}" for i in range(indicators)])
+    frame.insert(0, "country", np.repeat([f"Country {i}" for i in range(countries)], len(years)))
+    frame.insert(1, "year", np.tile(np.asarray(years), countries))
+    frame.insert(2, "iso_code", np.repeat([iso_code(i) for i in range(countries)], len(years)))
+    frame.to_csv(path, index=False)
+    return int((~np.isnan(values)).sum())
+
+
+def seed(countries=250, indicators=80, years=range(1750, 2020), workers=1, charts=200, dashboard_charts=24):
+    """Load the synthetic dataset into the current database; returns dataset and loader stats."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic-owid.csv")
+        cells = write_csv(path, countries, indicators, years)
+        started = time.perf_counter()
+        inserted, _, _ = BulkLoader(SOURCES["owid_co2"](), log=lambda msg: None, workers=workers).run(path=path)
+        load_secs = time.perf_counter() - started
+
+    country_ids = list(Country.objects.values_list("id", flat=True))
+    Emission.objects.bulk_create(
+        [
+            Emission(country_id=cid, year=year, basis=basis, value=float(year % 97))
+            for cid in country_ids for year in years
+            for basis in (Emission.TERRITORIAL, Emission.CONSUMPTION)
+        ],
+        batch_size=5000,
+    )
+    Population.objects.bulk_create(
+        [Population(country_id=cid, year=year, population=1_000_000 + year) for cid in country_ids for year in years],
+        batch_size=5000,
+    )
+    refresh_summaries()
+
+    owner, _ = get_user_model().objects.get_or_create(username=USERNAME)
+    configs = [
+        {"country": iso_code(i % countries), "range": {"start": years[0], "end": years[-1]}, "metrics": ["ind_000"]}
+        for i in range(charts)
+    ]
+    # bulk_create skips Chart.save(), which fills config_hash
+    Chart.objects.bulk_create(
+        [Chart(owner=owner, name=f"chart {i}", config=config, config_hash=config_hash(config))
+         for i, config in enumerate(configs)]
+    )
+    dashboard = Dashboard.objects.create(owner=owner, name="benchmark")
+    DashboardChart.objects.bulk_create(
+        [DashboardChart(dashboard=dashboard, chart_id=chart_id, position=i)
+         for i, chart_id in enumerate(Chart.objects.order_by("id").values_list("id", flat=True)[:dashboard_charts])]
+    )
+    return {
+        "dataset": {"countries": countries, "indicators": indicators, "years": len(years), "cells": cells},
+        "loader": {"cells": inserted, "seconds": round(load_secs, 3), "cells_per_s": round(inserted / load_secs)},
+    }
+
+
+def endpoints():
+    """
+    (name, path, params) for every GET route in emissions/urls.py (all but
+    charts/upsert/), against the seeded data.
+    """
+    country = Country.objects.order_by("iso_code").first()
+    indicator = Indicator.objects.order_by("code").first()
+    emission = Emission.objects.order_by("id").first()
+    observation = Observation.objects.order_by("id").first()
+    isos = list(Country.objects.order_by("iso_code").values_list("iso_code", flat=True)[:20])
+    codes = list(Indicator.objects.order_by("code").values_list("code", flat=True)[:5])
+    year = Emission.objects.order_by("-year").values_list("year", flat=True).first() or 2000
+    chart = Chart.objects.order_by("id").first()
+    dashboard = Dashboard.objects.order_by("id").first()
+    one = {"country__iso_code": country.iso_code}
+    series = {"country__iso_code": country.iso_code, "indicators": ",".join(codes)}
+
+    cases = [
+        ("api-root", "/api/", {}),
+        ("countries-list", "/api/countries/", {}),
+        ("countries-detail", f"/api/countries/{country.id}/", {}),
+        ("indicators-list", "/api/indicators/", {}),
+        ("indicators-detail", f"/api/indicators/{indicator.id}/", {}),
+        ("emissions-list", "/api/emissions/", one),
+        ("emissions-list-page", "/api/emissions/", {"page_size": 1000}),
+        ("emissions-detail", f"/api/emissions/{emission.id}/", {}),
+        ("emissions-summary", "/api/emissions/summary/", {**one, "year": year}),
+        ("emissions-summary-all", "/api/emissions/summary/all/", {"year": year}),
+        ("observations-list", "/api/observations/", {**one, "page_size": 1000}),
+        ("observations-detail", f"/api/observations/{observation.id}/", {}),
+        ("observations-timeseries", "/api/observations/timeseries/", series),
+        ("observations-timeseries-columnar", "/api/observations/timeseries/", {**series, "layout": "columnar"}),
+        ("observations-timeseries-batch", "/api/observations/timeseries/batch/",
+         {"countries": ",".join(isos), "indicators": ",".join(codes)}),
+        ("observations-aggregate-sum", "/api/observations/aggregate/", {"indicator": codes[0]}),
+        ("observations-aggregate-percentile", "/api/observations/aggregate/", {"indicator": codes[0], "stat": "percentile"}),
+        ("charts-list", "/api/charts/", {}),
+        ("async-countries", "/api/async/countries/", {}),
+        ("async-indicators", "/api/async/indicators/", {}),
+        ("async-timeseries", "/api/async/observations/timeseries/", series),
+        ("async-summary", "/api/async/emissions/summary/", {**one, "year": year}),
+        ("autocomplete-prefix", "/api/autocomplete/", {"q": country.name[:4]}),
+        # transposed letters: no prefix matches, so ranked by trigram overlap
+        ("autocomplete-trigram", "/api/autocomplete/", {"q": country.name[1] + country.name[0] + country.name[2:]}),
+    ]
+    if chart is not None:
+        cases.append(("charts-detail", f"/api/charts/{chart.id}/", {}))
+        cases.append(("charts-data", f"/api/charts/{chart.id}/data/", {}))
+    if dashboard is not None:
+        cases.append(("dashboards-list", "/api/dashboards/", {}))
+        cases.append(("dashboards-detail", f"/api/dashboards/{dashboard.id}/", {}))
+        cases.append(("dashboards-render", f"/api/dashboards/{dashboard.id}/render/", {}))
+    cases.append(("auth-check", "/api/auth-check/", {}))
+    return cases
+
+
+class QueryCounter:
+    """
+    Execute wrapper counting queries. dashboards.py re-installs the request
+    connection's wrappers on its pool threads, so their queries count too.
+    """
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def measure(repeat=20, cases=None):
+    """{name: {status, queries, bytes, p50_ms, p95_ms, warm_p50_ms}} for ``cases`` (default: endpoints())."""
+    # "testserver" under the test runner; DEBUG's implicit localhost otherwise
+    host = "testserver" if "testserver" in settings.ALLOWED_HOSTS else "localhost"
+    client = Client(HTTP_HOST=host, HTTP_ACCEPT="application/json")
+    owner = get_user_model().objects.filter(username=USERNAME).first()
+    results = {}
+    for name, path, params in cases or endpoints():
+        headers = {}
+        if path.startswith(AUTHENTICATED) and owner is not None:
+            # a fresh token per endpoint, so long runs never outlive one
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {AccessToken.for_user(owner)}"
+        cache.clear()
+        reset_cube()
+        reset_index()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = client.get(path, params, **headers)
+        result = {
+            "path": path,
+            "status": response.status_code,
+            "queries": queries.count,
+            "bytes": len(response.content),
+        }
+
+        cold = []
+        for _ in range(repeat):
+            cache.clear()
+            clear_memo()
+            started = time.perf_counter()
+            client.get(path, params, **headers)
+            cold.append((time.perf_counter() - started) * 1000)
+        warm = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(path, params, **headers)
+            warm.append((time.perf_counter() - started) * 1000)
+
+        cold.sort()
+        result.update(
+            p50_ms=round(statistics.median(cold), 3),
+            p95_ms=round(_percentile(cold, 95), 3),
+            warm_p50_ms=round(statistics.median(warm), 3),
+        )
+        results[name] = result
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+    }
+
+
+def compare(previous, current, tolerance=0.25):
+    """
+    Per-endpoint deltas between two result documents. An endpoint regresses
+    when it issues more queries or its cold p50 grows by more than
+    ``tolerance``. Returns (lines, regressions).
+    """
+    lines, regressions = [], []
+    for name, now in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if before is None:
+            lines.append(f"{name:<36} new")
+            continue
+        ratio = now["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+        worse = now["queries"] > before["queries"] or ratio > 1 + tolerance
+        if worse:
+            regressions.append(name)
+        lines.append(
+            f"{name:<36} queries {before['queries']:>3} -> {now['queries']:<3} "
+            f"p50 {before['p50_ms']:>8.2f} -> {now['p50_ms']:<8.2f} ms ({ratio:5.2f}x)"
+            f"{'  REGRESSION' if worse else ''}"
+        )
+    return lines, regressions
@@ -0,0 +1,225 @@
+"""
+Response cache for the read-only data API.
+
+Everything these endpoints return changes only when a loader runs, so
+cached payloads are keyed by the normalized request plus a *dataset
+version* derived from ``DatasetVersion``. The loader calls
+``bump_dataset_version()`` after a successful run. That moves every key
+at once, and stale entries are simply never read again before the LRU
+evicts them.
+
+CountryYearSummary refreshes (see summaries.py) only move the ALL scope;
+endpoints that read nothing but countries, indicators and observations
+key on the OBSERVATIONS scope, so editing one emission does not empty
+their cache.
+
+The same version drives strong ``ETag`` and ``Last-Modified`` headers, so
+browsers revalidate with conditional GETs and get 304s.
+
+Payloads larger than RESPONSE_CACHE_MAX_BYTES are served but not cached:
+MAX_ENTRIES bounds the number of entries, not their size, so this keeps
+the worst case of a per-process LocMemCache at MAX_ENTRIES times the cap.
+
+``async_cache_response`` does the same for the plain async views in
+async_views.py, caching the rendered JSON bytes. ``keyed_response`` is
+for payloads keyed by something other than the URL, such as a saved
+chart's config.
+"""
+import functools
+import hashlib
+import pickle
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.http import HttpResponse
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import DatasetVersion
+
+VERSION_KEY = "emissions:dataset-version"
+SUMMARY_SOURCE = "country_year_summary"
+
+# Version scopes: ALL moves on every load and summary refresh; OBSERVATIONS
+# ignores CountryYearSummary refreshes (single Emission/Population edits),
+# for endpoints that never read emissions or summaries.
+ALL = "all"
+OBSERVATIONS = "observations"
+
+
+def dataset_version(scope=ALL):
+    """
+    ``(version, last_modified)`` for everything loaded so far in ``scope``.
+    ``version`` is a short string that changes with every load;
+    ``last_modified`` is a Unix timestamp, or None before the first load.
+
+    Read from the cache and recomputed at most every DATASET_VERSION_TTL
+    seconds, so processes whose cache the loader could not reach (locmem
+    in another worker) pick up a new load within that window.
+    """
+    states = cache.get(VERSION_KEY)
+    if states is None:
+        states = _version_states(DatasetVersion.objects.values_list("source", "version", "loaded_at"))
+        cache.set(VERSION_KEY, states, getattr(settings, "DATASET_VERSION_TTL", 30))
+    return states[scope]
+
+
+async def adataset_version(scope=ALL):
+    """dataset_version() for async views."""
+    states = await cache.aget(VERSION_KEY)
+    if states is None:
+        states = _version_states(
+            [row async for row in DatasetVersion.objects.values_list("source", "version", "loaded_at")]
+        )
+        await cache.aset(VERSION_KEY, states, getattr(settings, "DATASET_VERSION_TTL", 30))
+    return states[scope]
+
+
+def _version_states(rows):
+    rows = list(rows)
+    return {
+        ALL: _version_state(rows),
+        OBSERVATIONS: _version_state([row for row in rows if row[0] != SUMMARY_SOURCE]),
+    }
+
+
+def _version_state(rows):
+    total = sum(version for _, version, _ in rows)
+    loaded = max((loaded_at for _, _, loaded_at in rows if loaded_at), default=None)
+    last_modified = int(loaded.timestamp()) if loaded else None
+    return f"{total}.{last_modified or 0}", last_modified
+
+
+def bump_dataset_version():
+    cache.delete(VERSION_KEY)
+
+
+def fits(data):
+    """Whether ``data`` is within RESPONSE_CACHE_MAX_BYTES once pickled (as the backends store it)."""
+    limit = getattr(settings, "RESPONSE_CACHE_MAX_BYTES", None)
+    if limit is None:
+        return True
+    size = len(data) if isinstance(data, bytes) else len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+    return size <= limit
+
+
+def request_key(request, version):
+    """Path + sorted, non-empty query params + renderer + dataset version."""
+    query = getattr(request, "query_params", request.GET)
+    params = sorted((k, v) for k, values in query.lists() for v in values if v != "")
+    fmt = getattr(getattr(request, "accepted_renderer", None), "format", "")
+    raw = f"{request.path}?{urlencode(params)}|{fmt}|{version}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_response(view_method):
+    """
+    Decorate a read-only viewset method so its successful payloads are
+    cached per (request, dataset version) and carry ETag/Last-Modified.
+    The version scope is the viewset's ``dataset_scope`` (default ALL).
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version, last_modified = dataset_version(getattr(self, "dataset_scope", ALL))
+        key = request_key(request, version)
+        etag = f'"{key[:32]}"'
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            response = not_modified
+        else:
+            data = cache.get(f"emissions:response:{key}")
+            if data is not None:
+                response = Response(data)
+            else:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if fits(response.data):
+                    cache.set(
+                        f"emissions:response:{key}", response.data,
+                        getattr(settings, "RESPONSE_CACHE_TIMEOUT", 24 * 60 * 60),
+                    )
+
+        return _validators(response, etag, last_modified)
+
+    return wrapper
+
+
+def keyed_response(request, key, last_modified, compute):
+    """
+    cache_response for a payload identified by ``key`` rather than the
+    request URL; ``key`` must already include the dataset version.
+    ``compute()`` returns the payload on a miss.
+    """
+    etag = f'"{key[:32]}"'
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = cache.get(f"emissions:response:{key}")
+        if data is None:
+            data = compute()
+            if fits(data):
+                cache.set(
+                    f"emissions:response:{key}", data,
+                    getattr(settings, "RESPONSE_CACHE_TIMEOUT", 24 * 60 * 60),
+                )
+        response = Response(data)
+    return _validators(response, etag, last_modified)
+
+
+def cached_payloads(keys):
+    """{key: payload} for whichever keyed_response() keys are cached, in one round trip."""
+    found = cache.get_many([f"emissions:response:{key}" for key in keys])
+    return {key: found[f"emissions:response:{key}"] for key in keys if f"emissions:response:{key}" in found}
+
+
+def store_payloads(payloads):
+    """Cache {key: payload} where keyed_response() will find them."""
+    cache.set_many(
+        {f"emissions:response:{key}": data for key, data in payloads.items() if fits(data)},
+        getattr(settings, "RESPONSE_CACHE_TIMEOUT", 24 * 60 * 60),
+    )
+
+
+def async_cache_response(view=None, *, scope=ALL):
+    """
+    cache_response for async function views returning JSON HttpResponses;
+    use as ``@async_cache_response`` or ``@async_cache_response(scope=...)``.
+    """
+    if view is None:
+        return functools.partial(async_cache_response, scope=scope)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        version, last_modified = await adataset_version(scope)
+        key = request_key(request, version)
+        etag = f'"{key[:32]}"'
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            content = await cache.aget(f"emissions:async-response:{key}")
+            if content is not None:
+                response = HttpResponse(content, content_type="application/json")
+            else:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if fits(response.content):
+                    await cache.aset(
+                        f"emissions:async-response:{key}", response.content,
+                        getattr(settings, "RESPONSE_CACHE_TIMEOUT", 24 * 60 * 60),
+                    )
+        return _validators(response, etag, last_modified)
+
+    return wrapper
+
+
+def _validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ["Accept"])
+    return response
@@ -0,0 +1,67 @@
+"""
+Saved chart configs, as written by the chart builder:
+
+    {"country": "DEU", "range": {"start": 1990, "end": 2020}, "metrics": ["co2", "gdp"]}
+"""
+import hashlib
+import json
+
+
+def normalize_config(config):
+    """
+    Validated, canonical copy of a chart config (ISO code upper-cased,
+    metrics de-duplicated in order, years as ints or None). Raises
+    ValueError with a user-facing message for configs that cannot be drawn.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("Chart config must be an object.")
+    country = config.get("country")
+    if not isinstance(country, str) or not country.strip():
+        raise ValueError("Chart config has no country.")
+    metrics = config.get("metrics")
+    if not isinstance(metrics, list) or not all(isinstance(m, str) for m in metrics):
+        raise ValueError("Chart config metrics must be a list of indicator codes.")
+    metrics = list(dict.fromkeys(m.strip() for m in metrics if m.strip()))
+    if not metrics:
+        raise ValueError("Chart config has no metrics.")
+
+    span = config.get("range")
+    if span is None:
+        span = {}
+    if not isinstance(span, dict):
+        raise ValueError("Chart config range must be an object.")
+    start, end = _year(span.get("start")), _year(span.get("end"))
+    if start is not None and end is not None and start > end:
+        raise ValueError("Chart config range starts after it ends.")
+
+    return {"country": country.strip().upper(), "range": {"start": start, "end": end}, "metrics": metrics}
+
+
+def _year(value):
+    """An integral year (int, or a string/float holding one), or None when blank."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError("Chart config range must hold integer years.")
+    if isinstance(value, str):
+        value = value.strip()
+        if not value.lstrip("-").isdigit():
+            raise ValueError("Chart config range must hold integer years.")
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise ValueError("Chart config range must hold integer years.")
+
+
+def config_hash(config):
+    """Stable digest of a normalized config: equal charts share cache entries."""
+    raw = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def data_key(config, layout, fmt, version):
+    """Response-cache key for a chart's series (see ChartViewSet.data)."""
+    return config_hash({"config": config, "layout": layout, "format": fmt, "version": version})
+
@@ -0,0 +1,407 @@
+"""
+Optional in-process cube of every Observation.
+
+With ``INDICATOR_CUBE = True`` each process keeps one float64 array of shape
+[country x indicator x year] (NaN where there is no value) next to a
+[country x year x field] block of CountryYearSummary, plus ISO / indicator
+code -> position dicts. The time-series, summary and aggregate endpoints
+then slice these arrays instead of querying the database.
+
+The cube is built on first use and rebuilt when the dataset version (see
+cache.py) moves after a load. A summary refresh alone (an Emission or
+Population edit) only rebuilds the small summary block; the observation
+block is kept, mapped snapshot included. The full OWID
+dataset (~250 countries x ~80 indicators x ~275 years) is ~45 MB.
+
+With ``INDICATOR_SNAPSHOT`` set to a file path, the loaders write the cube
+there (``write_snapshot``) and each process maps that file read-only
+instead of building its own copy, so every worker shares the same pages of
+the OS page cache. A new snapshot replaces the old one with an atomic
+rename; workers notice the changed file on their next request and map it,
+while requests still holding the old cube keep reading the old inode.
+A snapshot whose observation version does not match the current one is
+ignored and the cube is built from the database as without a snapshot.
+
+Snapshot layout: ``MAGIC``, a little-endian uint64 header length, a JSON
+header (version, axes, units, and dtype/shape/offset per array), then the
+raw C-order arrays, each aligned to 64 bytes.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from itertools import islice
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max, Min
+
+from .cache import OBSERVATIONS, adataset_version, bump_dataset_version, dataset_version
+from .models import Country, CountryYearSummary, Indicator, Observation
+from .summaries import SUMMARY_FIELDS
+
+MAGIC = b"TFCUBE1\n"
+ALIGN = 64
+ARRAYS = ("values", "summary_values", "has_summary")
+BUILD_CHUNK = 20000
+OBSERVATION_ROW = np.dtype([("country", "i8"), ("indicator", "i8"), ("year", "i8"), ("value", "f8")])
+
+_lock = threading.Lock()
+_cube = None
+
+
+def to_list(values):
+    """Floats for JSON, with NaN as null."""
+    return [None if v != v else v for v in np.asarray(values, dtype=float).tolist()]
+
+
+def _positions(ids, keys):
+    """Index of each of ``keys`` in ``ids`` (every key must be present)."""
+    ids = np.asarray(ids)
+    order = np.argsort(ids)
+    return order[np.searchsorted(ids, keys, sorter=order)]
+
+
+def _file_id(path):
+    """Changes whenever ``path`` is replaced or rewritten; None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _padding(offset):
+    return -offset % ALIGN
+
+
+class IndicatorCube:
+    snapshot_id = None  # _file_id() of INDICATOR_SNAPSHOT when this cube was loaded
+
+    def __init__(self, version, isos, codes, units, year0, values, summary, has_summary, observation_version=None):
+        self.version = version  # dataset_version(): moves with summary refreshes too
+        self.observation_version = observation_version or version  # dataset_version(OBSERVATIONS)
+        self.isos = isos  # sorted
+        self.codes = codes
+        self.units = units  # {code: unit}
+        self.year0 = year0
+        self.values = values  # [country, indicator, year]
+        self.summary_values = summary  # [country, year, SUMMARY_FIELDS]
+        self.has_summary = has_summary  # [country, year]
+        self.iso_index = {iso: i for i, iso in enumerate(isos)}
+        self.code_index = {code: i for i, code in enumerate(codes)}
+
+    @classmethod
+    def build(cls, version, observation_version=None):
+        """Read Country, Indicator, Observation and CountryYearSummary into arrays."""
+        countries = list(Country.objects.order_by("iso_code").values_list("id", "iso_code"))
+        indicators = list(Indicator.objects.order_by("code").values_list("id", "code", "unit"))
+        summ = np.array(
+            list(CountryYearSummary.objects.values_list("country_id", "year", *SUMMARY_FIELDS)),
+            dtype=float,
+        ).reshape(-1, 2 + len(SUMMARY_FIELDS))
+        span = Observation.objects.aggregate(lo=Min("year"), hi=Max("year"))
+
+        all_years = [y for y in (span["lo"], span["hi"]) if y is not None] + summ[:, 1].astype(int).tolist()
+        year0 = min(all_years) if all_years else 0
+        n_years = max(all_years) - year0 + 1 if all_years else 0
+        country_ids = [cid for cid, _ in countries]
+        indicator_ids = [iid for iid, _, _ in indicators]
+
+        # Filled a chunk at a time so the rows never exist as Python tuples all at once
+        values = np.full((len(countries), len(indicators), n_years), np.nan)
+        rows = Observation.objects.values_list("country_id", "indicator_id", "year", "value").iterator(
+            chunk_size=BUILD_CHUNK,
+        )
+        while True:
+            chunk = np.fromiter(islice(rows, BUILD_CHUNK), dtype=OBSERVATION_ROW)
+            if not len(chunk):
+                break
+            values[
+                _positions(country_ids, chunk["country"]),
+                _positions(indicator_ids, chunk["indicator"]),
+                chunk["year"] - year0,
+            ] = chunk["value"]
+
+        summary = np.full((len(countries), n_years, len(SUMMARY_FIELDS)), np.nan)
+        has_summary = np.zeros((len(countries), n_years), dtype=bool)
+        if len(summ):
+            rows, cols = _positions(country_ids, summ[:, 0]), summ[:, 1].astype(int) - year0
+            summary[rows, cols] = summ[:, 2:]
+            has_summary[rows, cols] = True
+
+        return cls(
+            version,
+            isos=[iso for _, iso in countries],
+            codes=[code for _, code, _ in indicators],
+            units={code: unit for _, code, unit in indicators},
+            year0=year0,
+            values=values,
+            summary=summary,
+            has_summary=has_summary,
+            observation_version=observation_version,
+        )
+
+    def with_summaries(self, version):
+        """
+        A cube sharing this one's observation block with the summary block
+        re-read from CountryYearSummary, or None when a summary row falls
+        outside the cube's countries or years (then rebuild it all).
+        """
+        rows = list(CountryYearSummary.objects.values_list("iso_code", "year", *SUMMARY_FIELDS))
+        n_years = self.values.shape[2]
+        positions = np.array([self.iso_index.get(iso, -1) for iso, *_ in rows], dtype=int)
+        cols = np.array([year for _, year, *_ in rows], dtype=int) - self.year0
+        if (positions < 0).any() or (cols < 0).any() or (cols >= n_years).any():
+            return None
+        summary = np.full((len(self.isos), n_years, len(SUMMARY_FIELDS)), np.nan)
+        has_summary = np.zeros((len(self.isos), n_years), dtype=bool)
+        if rows:
+            summary[positions, cols] = np.array([fields for _, _, *fields in rows], dtype=float)
+            has_summary[positions, cols] = True
+        cube = type(self)(
+            version, self.isos, self.codes, self.units, self.year0, self.values, summary, has_summary,
+            observation_version=self.observation_version,
+        )
+        cube.snapshot_id = self.snapshot_id
+        return cube
+
+    def save(self, path):
+        """Write a snapshot to ``path`` atomically (temp file + rename in the same directory)."""
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in ARRAYS}
+        header = {
+            "version": self.version, "observation_version": self.observation_version, "isos": self.isos, "codes": self.codes,
+            "units": self.units, "year0": self.year0, "arrays": {},
+        }
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": offset}
+            offset += array.nbytes + _padding(array.nbytes)
+        raw = json.dumps(header).encode()
+        start = len(MAGIC) + 8 + len(raw)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".cube-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(MAGIC + struct.pack("<Q", len(raw)) + raw + b"\0" * _padding(start))
+                for array in arrays.values():
+                    fh.write(array.tobytes())
+                    fh.write(b"\0" * _padding(array.nbytes))
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def read_header(cls, fh):
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not an indicator cube snapshot")
+        (length,) = struct.unpack("<Q", fh.read(8))
+        return json.loads(fh.read(length)), len(MAGIC) + 8 + length
+
+    @classmethod
+    def open(cls, path):
+        """Map a snapshot read-only; the arrays are views onto the shared mapping."""
+        with open(path, "rb") as fh:
+            header, start = cls.read_header(fh)
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        base = start + _padding(start)
+        arrays = {
+            name: np.frombuffer(
+                buf, dtype=spec["dtype"], count=int(np.prod(spec["shape"])), offset=base + spec["offset"],
+            ).reshape(spec["shape"])
+            for name, spec in header["arrays"].items()
+        }
+        return cls(
+            header["version"],
+            isos=header["isos"],
+            codes=header["codes"],
+            units=header["units"],
+            year0=header["year0"],
+            values=arrays["values"],
+            summary=arrays["summary_values"],
+            has_summary=arrays["has_summary"],
+            observation_version=header.get("observation_version"),
+        )
+
+    @property
+    def years(self):
+        return np.arange(self.year0, self.year0 + self.values.shape[2])
+
+    def year_range(self, year_min=None, year_max=None):
+        n = self.values.shape[2]
+        lo = 0 if year_min is None else min(max(0, int(year_min) - self.year0), n)
+        hi = n if year_max is None else min(max(0, int(year_max) - self.year0 + 1), n)
+        return np.arange(lo, max(lo, hi))
+
+    def _block(self, isos, codes, year_min, year_max):
+        """Known ``isos`` and ``codes`` (request order) and their [country, indicator, year] slice."""
+        isos = [iso for iso in isos if iso in self.iso_index]
+        codes = [code for code in codes if code in self.code_index]
+        cols = self.year_range(year_min, year_max)
+        block = self.values[np.ix_(
+            np.array([self.iso_index[iso] for iso in isos], dtype=int),
+            np.array([self.code_index[code] for code in codes], dtype=int),
+            cols,
+        )]
+        return isos, codes, self.years[cols], block
+
+    def timeseries(self, iso, codes, year_min=None, year_max=None):
+        """Same payload as timeseries.pivot_columnar() over observation_rows()."""
+        _, codes, years, block = self._block([iso], codes, year_min, year_max)
+        if not block.size:
+            return {"years": [], "series": {}, "units": {}}
+        present = ~np.isnan(block[0])
+        keep = present.any(axis=0)
+        series = {code: to_list(block[0, i, keep]) for i, code in enumerate(codes) if present[i].any()}
+        return {
+            "years": years[keep].tolist(),
+            "series": series,
+            "units": {code: self.units[code] for code in series},
+        }
+
+    def batch(self, isos, codes, year_min=None, year_max=None):
+        """
+        ``(cells, payload)``: the number of non-empty cells and the same
+        payload as timeseries.pivot_batch() over batch_rows().
+        """
+        isos, codes, years, block = self._block(isos, codes, year_min, year_max)
+        present = ~np.isnan(block)
+        keep = present.any(axis=(0, 1)) if block.size else np.zeros(len(years), dtype=bool)
+        has = present.any(axis=2)
+        countries = {}
+        for a, iso in enumerate(isos):
+            series = {code: to_list(block[a, b, keep]) for b, code in enumerate(codes) if has[a, b]}
+            if series:
+                countries[iso] = series
+        units = {code: self.units[code] for b, code in enumerate(codes) if has[:, b].any()}
+        return int(present.sum()), {"years": years[keep].tolist(), "units": units, "countries": countries}
+
+    def indicator_matrix(self, code, year_min=None, year_max=None, isos=None, contiguous=False):
+        """
+        ``(isos, years, matrix)`` for one indicator like aggregates.to_matrix():
+        only countries and years with data, or every year between the first
+        and last with ``contiguous``.
+        """
+        if code not in self.code_index:
+            return [], [], np.empty((0, 0))
+        rows = sorted(self.iso_index[iso] for iso in set(isos) if iso in self.iso_index) if isos else None
+        cols = self.year_range(year_min, year_max)
+        matrix = self.values[:, self.code_index[code], :][:, cols]
+        if rows is not None:
+            matrix = matrix[rows]
+        present = ~np.isnan(matrix)
+        keep_rows = present.any(axis=1)
+        keep_cols = present.any(axis=0)
+        if not keep_cols.any():
+            return [], [], np.empty((0, 0))
+        if contiguous:
+            first, last = np.flatnonzero(keep_cols)[[0, -1]]
+            keep_cols = np.zeros_like(keep_cols)
+            keep_cols[first:last + 1] = True
+        row_isos = [self.isos[i] for i in (rows if rows is not None else range(len(self.isos)))]
+        return (
+            [iso for iso, keep in zip(row_isos, keep_rows) if keep],
+            self.years[cols][keep_cols].tolist(),
+            matrix[keep_rows][:, keep_cols],
+        )
+
+    def _summary_row(self, row, col):
+        values = dict(zip(SUMMARY_FIELDS, to_list(self.summary_values[row, col])))
+        if values["population"] is not None:
+            values["population"] = int(values["population"])
+        return values
+
+    def summary(self, iso, year):
+        """Summary fields for (iso, year), all None without a row; KeyError for unknown countries."""
+        row = self.iso_index[iso]
+        col = int(year) - self.year0
+        if not 0 <= col < self.summary_values.shape[1] or not self.has_summary[row, col]:
+            return dict.fromkeys(SUMMARY_FIELDS)
+        return self._summary_row(row, col)
+
+    def summaries_for_year(self, year):
+        """[(iso, fields), ...] for every country with a summary row in ``year``."""
+        col = int(year) - self.year0
+        if not 0 <= col < self.summary_values.shape[1]:
+            return []
+        return [(self.isos[row], self._summary_row(row, col)) for row in np.flatnonzero(self.has_summary[:, col])]
+
+
+def _load(version, observation_version, path, snapshot_id, current=None):
+    cube = None
+    if current is not None and (current.observation_version, current.snapshot_id) == (observation_version, snapshot_id):
+        cube = current.with_summaries(version)
+    if cube is None and snapshot_id is not None:
+        try:
+            with open(path, "rb") as fh:
+                header, _ = IndicatorCube.read_header(fh)
+            if header.get("observation_version", header["version"]) == observation_version:
+                cube = IndicatorCube.open(path)
+                if cube.version != version:
+                    cube = cube.with_summaries(version)
+        except (OSError, ValueError):
+            cube = None  # replaced or unreadable mid-open; fall back to the database
+    if cube is None:
+        cube = IndicatorCube.build(version, observation_version)
+    cube.snapshot_id = snapshot_id
+    return cube
+
+
+def get_cube():
+    """The current process's cube, or None when INDICATOR_CUBE is off."""
+    global _cube
+    if not getattr(settings, "INDICATOR_CUBE", False):
+        return None
+    path = getattr(settings, "INDICATOR_SNAPSHOT", "")
+    snapshot_id = _file_id(path) if path else None
+    cube = _cube
+    if cube is not None and cube.snapshot_id != snapshot_id:
+        # A new snapshot means a new load: don't wait out DATASET_VERSION_TTL
+        bump_dataset_version()
+    version, _ = dataset_version()
+    if cube is None or cube.version != version or cube.snapshot_id != snapshot_id:
+        observation_version, _ = dataset_version(OBSERVATIONS)
+        with _lock:
+            if _cube is None or _cube.version != version or _cube.snapshot_id != snapshot_id:
+                _cube = _load(version, observation_version, path, snapshot_id, _cube)
+            cube = _cube
+    return cube
+
+
+async def aget_cube():
+    """
+    get_cube() for async views. Serving the current cube needs no thread
+    hop; only (re)building or mapping a new one runs in a sync thread.
+    """
+    if not getattr(settings, "INDICATOR_CUBE", False):
+        return None
+    path = getattr(settings, "INDICATOR_SNAPSHOT", "")
+    cube = _cube
+    if cube is not None and cube.snapshot_id == (_file_id(path) if path else None):
+        version, _ = await adataset_version()
+        if cube.version == version:
+            return cube
+    return await sync_to_async(get_cube)()
+
+
+def write_snapshot(path):
+    """Build the cube for the current dataset version from the database and write it to ``path``."""
+    bump_dataset_version()
+    version, _ = dataset_version()
+    observation_version, _ = dataset_version(OBSERVATIONS)
+    cube = IndicatorCube.build(version, observation_version)
+    cube.save(path)
+    return cube
+
+
+def reset_cube():
+    global _cube
+    _cube = None
@@ -0,0 +1,129 @@
+"""
+Rendering a dashboard: every chart's series in one response.
+
+Chart payloads are the ones charts/{id}/data/ serves and share its cache
+entries (charts.data_key), fetched in one get_many(). Misses come from the
+cube when it is enabled. Otherwise charts on the same country share one
+Observation query over the union of their metrics and years, and the
+per-country queries run in parallel on a small shared thread pool
+(DASHBOARD_RENDER_WORKERS). Execute wrappers on the request's connection
+(query counters, tracing) are installed on the pool thread's connection
+for the duration, so they see those queries too.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .cache import cached_payloads, store_payloads
+from .charts import data_key, normalize_config
+from .cube import get_cube
+from .timeseries import chart_payload, observation_rows, pivot_columnar
+
+_lock = threading.Lock()
+_executor = None
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "DASHBOARD_RENDER_WORKERS", 4),
+                thread_name_prefix="dashboard-render",
+            )
+        return _executor
+
+
+def country_rows(iso, configs):
+    """Observation rows for every config on ``iso``: the union of metrics over the widest year span."""
+    codes = list(dict.fromkeys(code for config in configs for code in config["metrics"]))
+    starts = [config["range"]["start"] for config in configs]
+    ends = [config["range"]["end"] for config in configs]
+    year_min = None if None in starts else min(starts)
+    year_max = None if None in ends else max(ends)
+    return list(observation_rows(iso, codes, year_min, year_max))
+
+
+def _pooled_country_rows(iso, configs, wrappers):
+    # Pool threads hold their own connections; honour CONN_MAX_AGE like a request would
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for wrapper in wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return country_rows(iso, configs)
+    finally:
+        close_old_connections()
+
+
+def slice_columnar(rows, config):
+    """pivot_columnar() of one config's share of country_rows()."""
+    codes = set(config["metrics"])
+    start, end = config["range"]["start"], config["range"]["end"]
+    own = [
+        row for row in rows
+        if row[1] in codes and (start is None or row[0] >= start) and (end is None or row[0] <= end)
+    ]
+    return pivot_columnar(own, config["metrics"])
+
+
+def compute_payloads(configs, layout):
+    """{chart id: payload} for normalized ``configs`` ({chart id: config})."""
+    cube = get_cube()
+    if cube is not None:
+        return {
+            cid: chart_payload(config, cube.timeseries(
+                config["country"], config["metrics"], config["range"]["start"], config["range"]["end"],
+            ), layout)
+            for cid, config in configs.items()
+        }
+
+    by_country = {}
+    for config in configs.values():
+        by_country.setdefault(config["country"], []).append(config)
+    # Pool threads cannot see this connection's open transaction (ATOMIC_REQUESTS, tests)
+    if len(by_country) == 1 or connection.in_atomic_block:
+        rows = {iso: country_rows(iso, group) for iso, group in by_country.items()}
+    else:
+        executor = get_executor()
+        wrappers = list(connection.execute_wrappers)
+        futures = {
+            iso: executor.submit(_pooled_country_rows, iso, group, wrappers) for iso, group in by_country.items()
+        }
+        rows = {iso: future.result() for iso, future in futures.items()}
+    return {
+        cid: chart_payload(config, slice_columnar(rows[config["country"]], config), layout)
+        for cid, config in configs.items()
+    }
+
+
+def render(charts, layout, fmt, version):
+    """
+    ``[{id, name, config, data, units}, ...]`` for ``charts`` in order (the
+    charts/{id}/data/ payload for ``layout``), or ``{id, name, error}`` for a
+    chart whose config cannot be drawn.
+    """
+    configs, errors = {}, {}
+    for chart in charts:
+        try:
+            configs[chart.id] = normalize_config(chart.config)
+        except ValueError as exc:
+            errors[chart.id] = str(exc)
+
+    keys = {cid: data_key(config, layout, fmt, version) for cid, config in configs.items()}
+    cached = cached_payloads(set(keys.values()))
+    payloads = {cid: cached[key] for cid, key in keys.items() if key in cached}
+    missing = {cid: config for cid, config in configs.items() if cid not in payloads}
+    if missing:
+        fresh = compute_payloads(missing, layout)
+        store_payloads({keys[cid]: payload for cid, payload in fresh.items()})
+        payloads.update(fresh)
+
+    return [
+        {"id": chart.id, "name": chart.name, "error": errors[chart.id]} if chart.id in errors
+        else {"id": chart.id, "name": chart.name, **payloads[chart.id]}
+        for chart in charts
+    ]
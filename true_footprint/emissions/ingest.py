@@ -0,0 +1,132 @@
+"""
+Parse/melt stage of the indicator loaders.
+
+Nothing in here touches Django, so these functions can run in worker
+processes (spawn or fork) without a configured settings module.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+def _open_zip(path, mode, encoding, newline):
+    """The archive's only member, as text (pandas' rule for .zip)."""
+    with zipfile.ZipFile(path) as archive:
+        names = [info.filename for info in archive.infolist() if not info.is_dir()]
+        if len(names) != 1:
+            raise ValueError(f"Expected one file in {path}, found {len(names)}")
+        # the member keeps the archive's file open until it is closed
+        return io.TextIOWrapper(archive.open(names[0]), encoding=encoding, newline=newline)
+
+
+_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open, ".zip": _open_zip}
+
+
+@dataclass(frozen=True)
+class CsvLayout:
+    """
+    Where the country, year, indicator and value live in a wide CSV.
+
+    OWID style (the default): one row per country-year, one column per
+    indicator. World Bank / Eurostat style: set ``indicator_col`` and
+    ``year_col=None``; rows are country-indicator and every column whose
+    header is a year holds values.
+    """
+    country_col: str = "country"
+    iso_col: str = "iso_code"
+    year_col: str | None = "year"
+    indicator_col: str | None = None
+    skip_cols: frozenset = frozenset()
+
+    @property
+    def id_cols(self):
+        return [c for c in (self.country_col, self.iso_col, self.year_col, self.indicator_col) if c]
+
+    def value_cols(self, columns):
+        if self.year_col is None:
+            return [c for c in columns if c.strip().isdigit()]
+        return [c for c in columns if c not in self.id_cols and c not in self.skip_cols]
+
+
+def open_text(path):
+    """Open a CSV for reading text, decompressing by file suffix."""
+    for suffix, opener in _OPENERS.items():
+        if str(path).endswith(suffix):
+            return opener(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def iter_csv_blocks(fh, lines_per_block):
+    """
+    Yield the header line once, then blocks of up to ``lines_per_block`` raw
+    CSV lines. Splitting on newlines assumes no quoted field spans lines,
+    which holds for the wide country/year datasets we ingest.
+    """
+    yield fh.readline()
+    block = []
+    for line in fh:
+        block.append(line)
+        if len(block) >= lines_per_block:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+def melt_block(header, text, layout):
+    """
+    Parse one block of CSV lines and melt it to the canonical long form.
+
+    Returns ``(countries, long, lines, seconds)``: distinct raw
+    ``(iso_code, country)`` pairs, ``long`` with columns
+    ``iso_code, year, code, value`` minus empty cells, the number of CSV
+    lines parsed and the time spent.
+    """
+    started = time.perf_counter()
+    text_cols = {c: str for c in (layout.country_col, layout.iso_col, layout.indicator_col) if c}
+    wide = pd.read_csv(io.StringIO(header + text), dtype=text_cols)
+    wide = wide.rename(columns={layout.country_col: "country", layout.iso_col: "iso_code"})
+
+    if layout.year_col is None:
+        long = wide.melt(id_vars=["iso_code", layout.indicator_col], value_vars=layout.value_cols(wide.columns),
+                         var_name="year", value_name="value")
+        long = long.rename(columns={layout.indicator_col: "code"})
+        long["year"] = long["year"].str.strip().astype("int64")
+    else:
+        long = wide.melt(id_vars=["iso_code", layout.year_col], value_vars=layout.value_cols(wide.columns),
+                         var_name="code", value_name="value")
+        long = long.rename(columns={layout.year_col: "year"})
+
+    long["value"] = pd.to_numeric(long["value"], errors="coerce")  # ".." and friends become NaN
+    long = long.dropna(subset=["iso_code", "value"])[["iso_code", "year", "code", "value"]]
+    countries = wide[["iso_code", "country"]].dropna(subset=["iso_code"]).drop_duplicates(subset="iso_code")
+    return countries, long, len(wide), time.perf_counter() - started
+
+
+def transform_blocks(header, blocks, layout, workers=1):
+    """
+    Run melt_block over ``blocks`` in order. With ``workers > 1`` blocks go to
+    a process pool with at most ``2 * workers`` in flight, so the consumer
+    (the single DB writer) overlaps with parsing while memory stays bounded.
+    """
+    if workers <= 1:
+        for text in blocks:
+            yield melt_block(header, text, layout)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for text in blocks:
+            pending.append(pool.submit(melt_block, header, text, layout))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,352 @@
+"""
+Pluggable loaders for wide indicator CSVs.
+
+Each upstream dataset is an ``IndicatorSource`` subclass declaring where its
+CSV lives, how it is laid out (``CsvLayout``), its units and how its country
+codes normalise to ISO3. Every source goes through the same ``BulkLoader``:
+streamed download, content-hash/ETag skip, chunked parse/melt (optionally in
+a process pool), vectorized FK mapping and diff-based bulk upserts inside
+one transaction. Upserts use the fastest path of the database backend:
+COPY into a staging table on PostgreSQL, INSERT ... ON CONFLICT via
+executemany elsewhere.
+
+Register a new source with ``@register`` and load it with
+``manage.py load_indicators <name>``.
+"""
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+import requests
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import bump_dataset_version
+from .ingest import CsvLayout, iter_csv_blocks, open_text, transform_blocks
+from .models import Country, DatasetVersion, Indicator, Observation
+
+KEY_COLS = ["country_id", "year", "indicator_id"]
+BATCH_SIZE = 20000  # rows per INSERT batch
+CSV_CHUNK_ROWS = 5000  # CSV lines parsed and melted at a time
+DOWNLOAD_BLOCK = 1 << 20
+
+SOURCES = {}
+
+
+def register(cls):
+    """Class decorator adding a source to SOURCES under its ``name``."""
+    SOURCES[cls.name] = cls
+    return cls
+
+
+class LoaderError(Exception):
+    pass
+
+
+class IndicatorSource:
+    name = None  # DatasetVersion.source and the load_indicators argument
+    label = ""  # stored on Indicator.source
+    url = None
+    layout = CsvLayout()
+    units = {}
+
+    def indicator_name(self, code):
+        return code.replace("_", " ").title()
+
+    def normalize_iso(self, codes):
+        """
+        Map a Series of raw country codes to ISO3, NaN for rows that are not
+        countries (aggregates such as OWID_WRL). Sources with alpha-2 or
+        otherwise non-standard codes override this.
+        """
+        codes = codes.str.strip().str.upper()
+        return codes.where(codes.str.fullmatch(r"[A-Z]{3}", na=False))
+
+
+@register
+class OwidCo2Source(IndicatorSource):
+    name = "owid_co2"
+    label = "OWID CO₂ dataset"
+    url = "https://raw.githubusercontent.com/owid/co2-data/master/owid-co2-data.csv"
+    # Optional, extend as desired:
+    units = {
+        "co2": "Mt CO₂",
+        "co2_per_capita": "t CO₂/person",
+        "consumption_co2": "Mt CO₂",
+        "consumption_co2_per_capita": "t CO₂/person",
+        "gdp": "intl-$ (PPP)",
+        "population": "people",
+        # add more if you care about labels; leaving blank is fine
+    }
+
+
+class BulkLoader:
+    """
+    The shared load engine. ``log`` receives progress lines (a management
+    command passes ``self.stdout.write``).
+    """
+
+    def __init__(self, source, log=print, chunksize=CSV_CHUNK_ROWS, workers=1, batch_size=BATCH_SIZE):
+        self.source = source
+        self.log = log
+        self.chunksize = chunksize
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+
+    def run(self, url=None, path=None, incremental=False):
+        """
+        Load from a local ``path`` or download ``url`` (default: the source's).
+        Returns (inserted, updated, unchanged), or None when ``incremental``
+        and the dataset has not changed since the last load.
+        """
+        state, _ = DatasetVersion.objects.get_or_create(source=self.source.name)
+
+        if path:
+            etag, cleanup = "", False
+            if not os.path.exists(path):
+                raise LoaderError(f"No such file: {path}")
+        else:
+            path, etag = self.download(url or self.source.url, state.etag if incremental else "")
+            if path is None:
+                self.log(f"{self.source.name} unchanged (ETag {state.etag}); nothing to do")
+                return None
+            cleanup = True
+
+        try:
+            content_hash = _sha256(path)
+            if incremental and content_hash == state.content_hash:
+                self.log(f"{self.source.name} unchanged (sha256 {content_hash[:12]}); nothing to do")
+                return None
+
+            # One transaction: a failed run leaves countries, indicators,
+            # observations and the dataset version exactly as they were
+            with transaction.atomic():
+                counts = self.load_file(path)
+
+                state.etag = etag
+                state.content_hash = content_hash
+                state.version += 1
+                state.loaded_at = timezone.now()
+                state.save()
+
+            # Refresh planner statistics so reads pick the covering indexes
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(Observation._meta.db_table)}")
+            bump_dataset_version()
+        finally:
+            if cleanup:
+                os.unlink(path)
+        return counts
+
+    def download(self, url, etag):
+        """
+        Stream the CSV to a temporary file; returns (path, etag), or
+        (None, etag) when the server answers 304 to our If-None-Match.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        with requests.get(url, headers=headers, stream=True, timeout=60) as resp:
+            if resp.status_code == 304:
+                return None, etag
+            resp.raise_for_status()
+            suffix = ".csv.gz" if url.endswith(".gz") else ".csv"
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as out:
+                for block in resp.iter_content(DOWNLOAD_BLOCK):
+                    out.write(block)
+            return out.name, resp.headers.get("ETag", "")
+
+    def load_file(self, path):
+        """
+        Parse and melt CSV blocks (in a process pool when workers > 1) and
+        write them from this thread; return (inserted, updated, unchanged).
+        """
+        layout = self.source.layout
+        self.indicator_ids = {}
+        totals = [0, 0, 0]
+        lines = cells = 0
+        parse_secs = write_secs = 0.0
+        started = time.perf_counter()
+
+        try:
+            fh = open_text(path)
+        except ValueError as exc:  # a .zip without exactly one member
+            raise LoaderError(str(exc))
+        with fh:
+            blocks = iter_csv_blocks(fh, self.chunksize)
+            header = next(blocks)
+            columns = next(csv.reader([header]))
+            # Ensure core columns exist
+            for col in layout.id_cols:
+                if col not in columns:
+                    raise LoaderError(f"Missing required column {col}")
+            if layout.year_col is not None:
+                # Indicators are the header's columns: register them all up front
+                self.upsert_indicators(layout.value_cols(columns))
+
+            for countries, long, n_lines, secs in transform_blocks(header, blocks, layout, self.workers):
+                lines += n_lines
+                cells += len(long)
+                parse_secs += secs
+
+                write_started = time.perf_counter()
+                counts = self.load_chunk(countries, long)
+                write_secs += time.perf_counter() - write_started
+                totals = [t + c for t, c in zip(totals, counts)]
+
+        elapsed = time.perf_counter() - started
+        written = totals[0] + totals[1]
+        self.log(
+            f"parse+melt: {lines} lines -> {cells} cells in {parse_secs:.1f} worker-s, "
+            f"{_rate(cells, parse_secs)} cells/s per worker x {self.workers}\n"
+            f"diff+write: {cells} cells ({written} upserted) in {write_secs:.1f}s, "
+            f"{_rate(cells, write_secs)} cells/s\n"
+            f"overall: {_rate(cells, elapsed)} cells/s ({elapsed:.1f}s wall)"
+        )
+        return tuple(totals)
+
+    def upsert_indicators(self, codes):
+        """Create/update any indicators not seen yet in this run."""
+        codes = [c for c in codes if c not in self.indicator_ids]
+        if not codes:
+            return
+        Indicator.objects.bulk_create(
+            [
+                Indicator(
+                    code=code,
+                    name=self.source.indicator_name(code),
+                    unit=self.source.units.get(code, ""),
+                    source=self.source.label,
+                )
+                for code in codes
+            ],
+            update_conflicts=True,
+            unique_fields=["code"],
+            update_fields=["name", "unit", "source"],
+        )
+        self.indicator_ids.update(Indicator.objects.filter(code__in=codes).values_list("code", "id"))
+
+    def upsert_countries(self, countries):
+        """Create/update countries with proper names; return {raw code: country id}."""
+        countries = countries.assign(iso=self.source.normalize_iso(countries["iso_code"]))
+        countries = countries.dropna(subset=["iso"])
+        unique = countries.drop_duplicates(subset="iso")
+        if unique.empty:
+            return {}
+        Country.objects.bulk_create(
+            [Country(iso_code=iso, name=name) for iso, name in unique[["iso", "country"]].itertuples(index=False)],
+            update_conflicts=True,
+            unique_fields=["iso_code"],
+            update_fields=["name"],
+        )
+        ids = dict(Country.objects.filter(iso_code__in=unique["iso"].tolist()).values_list("iso_code", "id"))
+        return {raw: ids[iso] for raw, iso in countries[["iso_code", "iso"]].itertuples(index=False)}
+
+    def load_chunk(self, countries, long):
+        country_ids = self.upsert_countries(countries)
+        self.upsert_indicators(long["code"].unique().tolist())
+
+        # Map raw country / indicator codes to FK ids column-wise; unknown codes drop out
+        long = long.assign(
+            country_id=long["iso_code"].map(country_ids),
+            indicator_id=long["code"].map(self.indicator_ids),
+        )
+        cells = long.dropna(subset=["country_id", "indicator_id"]).astype(
+            {"country_id": "int64", "year": "int64", "indicator_id": "int64", "value": "float64"}
+        )[KEY_COLS + ["value"]]
+        if cells.empty:
+            return 0, 0, 0
+
+        # Diff against what is already stored for this chunk's countries,
+        # years and indicators, so only new or revised cells get written and
+        # the read stays as large as the chunk (not every source's data)
+        stored = Observation.objects.filter(
+            country_id__in=sorted(set(country_ids.values())),
+            indicator_id__in=sorted(cells["indicator_id"].unique().tolist()),
+            year__gte=int(cells["year"].min()),
+            year__lte=int(cells["year"].max()),
+        )
+        existing = pd.DataFrame.from_records(
+            stored.values_list(*KEY_COLS, "value").iterator(chunk_size=BATCH_SIZE),
+            columns=KEY_COLS + ["old_value"],
+        )
+        merged = cells.merge(existing, on=KEY_COLS, how="left")
+        is_new = merged["old_value"].isna()
+        is_changed = ~is_new & (merged["value"] != merged["old_value"])
+        inserted, updated = int(is_new.sum()), int(is_changed.sum())
+
+        self.upsert(merged.loc[is_new | is_changed, KEY_COLS + ["value"]])
+        return inserted, updated, len(merged) - inserted - updated
+
+    def upsert(self, frame):
+        """
+        Write (country_id, year, indicator_id, value) rows, inserting new
+        cells and overwriting the value of existing ones, batch_size rows at a
+        time. Rows go straight from the frame's arrays to the driver without
+        building Observation instances.
+        """
+        write = self.copy_upsert if connection.vendor == "postgresql" else self.executemany_upsert
+        for start in range(0, len(frame), self.batch_size):
+            chunk = frame.iloc[start:start + self.batch_size]
+            write(list(zip(
+                chunk["country_id"].tolist(),
+                chunk["year"].tolist(),
+                chunk["indicator_id"].tolist(),
+                chunk["value"].tolist(),
+            )))
+
+    def executemany_upsert(self, rows):
+        """INSERT ... ON CONFLICT DO UPDATE, one executemany per batch (SQLite)."""
+        qn = connection.ops.quote_name
+        cols = KEY_COLS + ["value"]
+        sql = (
+            f"INSERT INTO {qn(Observation._meta.db_table)} ({', '.join(map(qn, cols))}) "
+            f"VALUES ({', '.join(['%s'] * len(cols))}) "
+            f"ON CONFLICT ({', '.join(map(qn, KEY_COLS))}) DO UPDATE SET {qn('value')} = excluded.{qn('value')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    def copy_upsert(self, rows):
+        """
+        PostgreSQL: COPY the batch into a temporary staging table, then one
+        INSERT ... SELECT ... ON CONFLICT DO UPDATE into observations.
+        """
+        qn = connection.ops.quote_name
+        cols = ", ".join(map(qn, KEY_COLS + ["value"]))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE IF NOT EXISTS observation_stage "
+                "(country_id bigint, year integer, indicator_id bigint, value double precision) "
+                "ON COMMIT DROP"
+            )
+            copy_sql = f"COPY observation_stage ({cols}) FROM STDIN"
+            if hasattr(cursor.cursor, "copy"):  # psycopg 3
+                with cursor.cursor.copy(copy_sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:  # psycopg2
+                buf = io.StringIO()
+                csv.writer(buf, delimiter="\t", lineterminator="\n").writerows(rows)
+                buf.seek(0)
+                cursor.cursor.copy_expert(copy_sql, buf)
+            cursor.execute(
+                f"INSERT INTO {qn(Observation._meta.db_table)} ({cols}) "
+                f"SELECT {cols} FROM observation_stage "
+                f"ON CONFLICT ({', '.join(map(qn, KEY_COLS))}) DO UPDATE SET {qn('value')} = excluded.{qn('value')}"
+            )
+            cursor.execute("TRUNCATE observation_stage")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(DOWNLOAD_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _rate(count, seconds):
+    return f"{count / seconds:,.0f}" if seconds > 0 else "n/a"
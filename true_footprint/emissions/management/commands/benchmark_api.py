@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from emissions import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic OWID-scale dataset into a throwaway test database and record "
+        "loader throughput plus query count, p50/p95 latency and payload size for every "
+        "API endpoint, as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--countries", type=int, default=250)
+        parser.add_argument("--indicators", type=int, default=80)
+        parser.add_argument("--years", type=int, default=270)
+        parser.add_argument("--repeat", type=int, default=20, help="Timed requests per endpoint (default: %(default)s)")
+        parser.add_argument("--workers", type=int, default=1, help="Loader parse workers (default: %(default)s)")
+        parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+        parser.add_argument("--compare", help="Earlier results file to diff against")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Allowed cold-p50 growth before --compare reports a regression (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true",
+            help="Exit non-zero when --compare finds a regression",
+        )
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=[])
+        try:
+            results = {"environment": benchmarks.environment()}
+            self.stderr.write("Seeding synthetic dataset...")
+            results.update(benchmarks.seed(
+                countries=options["countries"],
+                indicators=options["indicators"],
+                years=range(2020 - options["years"], 2020),
+                workers=options["workers"],
+            ))
+            self.stderr.write(f"Loaded {results['loader']['cells']} cells; measuring endpoints...")
+            results["endpoints"] = benchmarks.measure(repeat=options["repeat"])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        document = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(document + "\n")
+        else:
+            self.stdout.write(document)
+
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as fh:
+                    previous = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+            lines, regressions = benchmarks.compare(previous, results, options["tolerance"])
+            self.stderr.write("\n".join(lines))
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} endpoint(s) regressed: {', '.join(regressions)}")
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlencode
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from emissions.models import Country, Indicator
+
+# (name, sync path, async path)
+ENDPOINTS = [
+    ("timeseries", "/api/observations/timeseries/", "/api/async/observations/timeseries/"),
+    ("summary", "/api/emissions/summary/", "/api/async/emissions/summary/"),
+    ("countries", "/api/countries/", "/api/async/countries/"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync DRF read endpoints against their async versions by "
+        "sending concurrent requests through the ASGI application in-process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint (default: %(default)s)")
+        parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight (default: %(default)s)")
+        parser.add_argument(
+            "--warm", action="store_true",
+            help="Repeat identical requests so the response cache answers (default: every request misses it)",
+        )
+        parser.add_argument(
+            "--endpoints", default=",".join(name for name, _, _ in ENDPOINTS),
+            help="Comma-separated subset to run (default: %(default)s)",
+        )
+        parser.add_argument("--json", action="store_true", help="Print one JSON object per line instead of text")
+
+    def handle(self, *args, **options):
+        isos = list(Country.objects.values_list("iso_code", flat=True)[:50]) or ["USA"]
+        codes = ",".join(Indicator.objects.values_list("code", flat=True)[:3]) or "co2"
+        app = get_asgi_application()
+
+        selected = options["endpoints"].split(",")
+        for name, sync_path, async_path in ENDPOINTS:
+            if name not in selected:
+                continue
+            for flavour, path in (("sync", sync_path), ("async", async_path)):
+                queries = [
+                    self.query(name, isos[i % len(isos)], codes, None if options["warm"] else i)
+                    for i in range(options["requests"])
+                ]
+                result = asyncio.run(self.run(app, path, queries, options["concurrency"]))
+                result.update(endpoint=name, flavour=flavour, concurrency=options["concurrency"])
+                if options["json"]:
+                    self.stdout.write(json.dumps(result))
+                else:
+                    self.stdout.write(
+                        f"{name:<11} {flavour:<5} {result['requests_per_s']:>9,.0f} req/s  "
+                        f"p50 {result['p50_ms']:>7.1f} ms  p99 {result['p99_ms']:>7.1f} ms  "
+                        f"non-200: {result['errors']}"
+                    )
+
+    def query(self, name, iso, codes, bust):
+        params = {}
+        if name == "timeseries":
+            params = {"country__iso_code": iso, "indicators": codes}
+        elif name == "summary":
+            params = {"country__iso_code": iso, "year": 2000}
+        if bust is not None:
+            params["_"] = bust  # unique cache key per request
+        return urlencode(params).encode()
+
+    async def run(self, app, path, queries, concurrency):
+        gate = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one(query):
+            nonlocal errors
+            async with gate:
+                started = time.perf_counter()
+                status = await self.request(app, path, query)
+                latencies.append(time.perf_counter() - started)
+                errors += status != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in queries))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "requests": len(queries),
+            "requests_per_s": len(queries) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            "errors": errors,
+        }
+
+    async def request(self, app, path, query):
+        """One GET through the ASGI callable; returns the status code."""
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query, "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+            "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+        }
+        status = 0
+        body_sent = False
+        finished = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await finished.wait()  # like a server: nothing more until the client goes away
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                finished.set()
+
+        await app(scope, receive, send)
+        return status
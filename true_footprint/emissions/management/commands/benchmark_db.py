@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from emissions.loaders import SOURCES, BulkLoader
+from emissions.models import Country, Indicator, Observation
+from emissions.timeseries import observation_rows
+
+YEARS = range(1900, 2000)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark bulk observation writes (ORM bulk_create vs. the loader's backend "
+        "fast path) and API-style reads during a write, on the configured database. "
+        "Everything written is rolled back. Run once per DJANGO_DB_ENGINE to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cells", type=int, default=100_000, help="Observations per write (default: %(default)s)")
+        parser.add_argument("--readers", type=int, default=4, help="Reader threads (default: %(default)s)")
+        parser.add_argument("--json", action="store_true", help="Print one JSON object instead of text")
+
+    def handle(self, *args, **options):
+        cells, readers = options["cells"], options["readers"]
+        results = {"vendor": connection.vendor, "cells": cells}
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                results["journal_mode"] = cursor.fetchone()[0]
+
+        results["bulk_create_cells_per_s"] = cells / self.timed_write(cells, "bulk_create")
+        results["fast_path_cells_per_s"] = cells / self.timed_write(cells, "fast")
+        results.update(self.reads_during_write(cells, readers))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results))
+            return
+        mode = f" (journal_mode={results['journal_mode']})" if "journal_mode" in results else ""
+        self.stdout.write(
+            f"{results['vendor']}{mode}, {cells} cells\n"
+            f"  ORM bulk_create:     {results['bulk_create_cells_per_s']:>12,.0f} cells/s\n"
+            f"  loader fast path:    {results['fast_path_cells_per_s']:>12,.0f} cells/s\n"
+            f"  reads during write:  {results['reads_per_s']:>12,.0f} reads/s over {readers} threads, "
+            f"{results['read_errors']} lock errors"
+        )
+
+    def synthetic_rows(self, cells):
+        """Throwaway countries/indicators and (country_id, year, indicator_id, value) rows."""
+        n_indicators = 10
+        n_countries = max(1, -(-cells // (n_indicators * len(YEARS))))
+        countries = Country.objects.bulk_create(
+            [Country(name=f"bench {i}", iso_code=f"{i:03d}") for i in range(n_countries)]
+        )
+        indicators = Indicator.objects.bulk_create(
+            [Indicator(code=f"bench_{i}", name=f"bench {i}") for i in range(n_indicators)]
+        )
+        rows = (
+            (c.id, year, ind.id, float(year))
+            for c in countries for ind in indicators for year in YEARS
+        )
+        return [row for row, _ in zip(rows, range(cells))]
+
+    def timed_write(self, cells, path):
+        with transaction.atomic():
+            rows = self.synthetic_rows(cells)
+            loader = BulkLoader(SOURCES["owid_co2"](), log=lambda msg: None)
+            started = time.perf_counter()
+            if path == "bulk_create":
+                Observation.objects.bulk_create(
+                    [Observation(country_id=c, year=y, indicator_id=i, value=v) for c, y, i, v in rows],
+                    batch_size=loader.batch_size,
+                    update_conflicts=True,
+                    unique_fields=["country", "indicator", "year"],
+                    update_fields=["value"],
+                )
+            else:
+                write = loader.copy_upsert if connection.vendor == "postgresql" else loader.executemany_upsert
+                for start in range(0, len(rows), loader.batch_size):
+                    write(rows[start:start + loader.batch_size])
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed
+
+    def reads_during_write(self, cells, readers):
+        """Reader threads run time-series queries for as long as one write transaction is open."""
+        isos = list(Country.objects.values_list("iso_code", flat=True)[:50]) or ["USA"]
+        codes = list(Indicator.objects.values_list("code", flat=True)[:3]) or ["co2"]
+        done = threading.Event()
+        counts = [[0, 0] for _ in range(readers)]
+
+        def read(slot):
+            try:
+                i = 0
+                while not done.is_set():
+                    try:
+                        list(observation_rows(isos[i % len(isos)], codes))
+                        counts[slot][0] += 1
+                    except OperationalError:
+                        counts[slot][1] += 1
+                    i += 1
+            finally:
+                connection.close()  # this thread's own connection
+
+        threads = [threading.Thread(target=read, args=(slot,)) for slot in range(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            self.timed_write(cells, "fast")
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        return {
+            "reads_per_s": sum(ok for ok, _ in counts) / elapsed,
+            "read_errors": sum(err for _, err in counts),
+        }
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from emissions.cube import write_snapshot
+from emissions.loaders import BATCH_SIZE, CSV_CHUNK_ROWS, SOURCES, BulkLoader, LoaderError
+
+
+class Command(BaseCommand):
+    help = "Load a registered wide indicator CSV source into Indicator/Observation tables"
+    source_name = None  # fixed by per-source subclasses such as load_owid_co2
+
+    def add_arguments(self, parser):
+        if self.source_name is None:
+            parser.add_argument("source", choices=sorted(SOURCES), help="Registered source to load")
+        where = parser.add_mutually_exclusive_group()
+        where.add_argument("--url", help="Download the CSV from this URL (default: the source's)")
+        where.add_argument("--file", help="Read a local CSV instead of downloading; .gz/.bz2/.zip/.xz are decompressed")
+        parser.add_argument(
+            "--chunksize", type=int, default=CSV_CHUNK_ROWS,
+            help="CSV rows per chunk; bounds peak memory (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Processes parsing and melting chunks in parallel; 1 parses inline (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=BATCH_SIZE,
+            help="Rows per INSERT batch (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--incremental", action="store_true",
+            help="Skip the load when the dataset's ETag or content hash is unchanged since the last run",
+        )
+        parser.add_argument(
+            "--snapshot", default=getattr(settings, "INDICATOR_SNAPSHOT", ""),
+            help="Write the indicator cube snapshot here after loading (default: INDICATOR_SNAPSHOT)",
+        )
+
+    def handle(self, *args, **options):
+        source = SOURCES[self.source_name or options["source"]]()
+        loader = BulkLoader(
+            source,
+            log=self.stdout.write,
+            chunksize=options["chunksize"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+        )
+        try:
+            counts = loader.run(url=options["url"], path=options["file"], incremental=options["incremental"])
+        except LoaderError as exc:
+            raise CommandError(str(exc))
+        if counts is not None:
+            inserted, updated, unchanged = counts
+            self.stdout.write(self.style.SUCCESS(
+                f"Loaded {source.label or source.name}: "
+                f"{inserted} inserted, {updated} updated, {unchanged} unchanged"
+            ))
+
+        if options["snapshot"]:
+            cube = write_snapshot(options["snapshot"])
+            self.stdout.write(f"Wrote snapshot {options['snapshot']} (version {cube.version})")
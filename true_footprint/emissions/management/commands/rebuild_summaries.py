@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from emissions.cube import write_snapshot
+from emissions.summaries import refresh_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CountryYearSummary table from Emission and Population"
+
+    def handle(self, *args, **options):
+        count = refresh_summaries()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} country-year summaries"))
+        if getattr(settings, "INDICATOR_SNAPSHOT", ""):
+            write_snapshot(settings.INDICATOR_SNAPSHOT)
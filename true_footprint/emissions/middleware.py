@@ -0,0 +1,51 @@
+import re
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import cc_delim_re, patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+re_accepts_brotli = re.compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that answers with brotli instead when the client accepts
+    ``br`` and the brotli package is installed. Quality 5 keeps compression
+    cheap enough for per-request use while beating gzip on JSON.
+
+    Brotli is limited to ``Cache-Control: public`` responses (the shared
+    data-API payloads, see cache.py), which hold no secrets to leak through
+    compressed sizes (BREACH). Everything else, such as admin pages with
+    CSRF tokens, token endpoints and per-user responses, goes through
+    GZipMiddleware and its randomized gzip header. So do streaming
+    responses and bodies under 200 bytes.
+    """
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        if (
+            brotli is None
+            or "public" not in cc_delim_re.split(response.get("Cache-Control", ""))
+            or response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < 200
+            or not re_accepts_brotli.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        # The body changed, so a strong validator no longer applies (as in GZipMiddleware)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
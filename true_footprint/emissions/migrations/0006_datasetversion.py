@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0005_alter_chart_options_remove_chart_dashboard_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=64, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('loaded_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='chart',
+            constraint=models.UniqueConstraint(fields=('owner', 'name'), name='uniq_owner_name'),
+        ),
+    ]
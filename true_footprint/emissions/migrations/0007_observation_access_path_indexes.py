@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0006_datasetversion'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='emission',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='observation',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='population',
+            options={},
+        ),
+        migrations.AlterUniqueTogether(
+            name='observation',
+            unique_together={('country', 'indicator', 'year')},
+        ),
+        migrations.AddIndex(
+            model_name='emission',
+            index=models.Index(fields=['country', 'year', 'basis', 'value'], name='emis_country_year_basis_cov'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['country', 'indicator', 'year', 'value'], name='obs_country_ind_year_cov'),
+        ),
+        migrations.AddIndex(
+            model_name='population',
+            index=models.Index(fields=['country', 'year', 'population'], name='pop_country_year_cov'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Emission = apps.get_model('emissions', 'Emission')
+    Population = apps.get_model('emissions', 'Population')
+    Country = apps.get_model('emissions', 'Country')
+    CountryYearSummary = apps.get_model('emissions', 'CountryYearSummary')
+
+    values = {}
+    for country_id, year, basis, value in Emission.objects.values_list('country_id', 'year', 'basis', 'value'):
+        values.setdefault((country_id, year), {})[basis] = value
+    for country_id, year, population in Population.objects.values_list('country_id', 'year', 'population'):
+        values.setdefault((country_id, year), {})['population'] = population
+
+    isos = dict(Country.objects.values_list('id', 'iso_code'))
+    rows = []
+    for (country_id, year), v in values.items():
+        terr, cons, pop = v.get('territorial'), v.get('consumption'), v.get('population')
+        rows.append(CountryYearSummary(
+            country_id=country_id, iso_code=isos[country_id], year=year,
+            territorial=terr, consumption=cons, population=pop,
+            per_capita_territorial=terr / pop if (terr is not None and pop) else None,
+            per_capita_consumption=cons / pop if (cons is not None and pop) else None,
+        ))
+    CountryYearSummary.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0007_observation_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountryYearSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iso_code', models.CharField(max_length=3)),
+                ('year', models.PositiveIntegerField()),
+                ('territorial', models.FloatField(null=True)),
+                ('consumption', models.FloatField(null=True)),
+                ('population', models.BigIntegerField(null=True)),
+                ('per_capita_territorial', models.FloatField(null=True)),
+                ('per_capita_consumption', models.FloatField(null=True)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='emissions.country')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'iso_code'], name='summary_year_iso')],
+                'unique_together': {('iso_code', 'year')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
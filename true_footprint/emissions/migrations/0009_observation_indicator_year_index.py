@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0008_countryyearsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['indicator', 'year', 'country', 'value'], name='obs_ind_year_country_cov'),
+        ),
+    ]
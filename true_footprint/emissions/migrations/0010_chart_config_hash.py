@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+from emissions.charts import config_hash
+
+
+def backfill(apps, schema_editor):
+    Chart = apps.get_model('emissions', 'Chart')
+    charts = list(Chart.objects.only('id', 'config'))
+    for chart in charts:
+        chart.config_hash = config_hash(chart.config)
+    Chart.objects.bulk_update(charts, ['config_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0009_observation_indicator_year_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chart',
+            name='config_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chart',
+            index=models.Index(fields=['owner', '-updated', '-id'], name='chart_owner_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0010_chart_config_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardChart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('chart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emissions.chart')),
+                ('dashboard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='emissions.dashboard')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dashboard',
+            name='charts',
+            field=models.ManyToManyField(related_name='dashboards', through='emissions.DashboardChart', to='emissions.chart'),
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardchart',
+            constraint=models.UniqueConstraint(fields=('dashboard', 'position'), name='uniq_dashboard_position'),
+        ),
+    ]
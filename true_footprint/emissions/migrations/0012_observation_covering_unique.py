@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:11
+
+import emissions.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emissions', '0011_dashboard_charts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emission',
+            name='emis_country_year_basis_cov',
+        ),
+        migrations.RemoveIndex(
+            model_name='observation',
+            name='obs_country_ind_year_cov',
+        ),
+        migrations.AlterUniqueTogether(
+            name='observation',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='observation',
+            constraint=emissions.models.CoveringUniqueConstraint(fields=('country', 'indicator', 'year'), include=('value',), name='obs_country_ind_year_uniq'),
+        ),
+    ]
@@ -1,7 +1,36 @@
 from django.db import models
+from django.db.models import F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast, NullIf
 
 from true_footprint import settings
 
+from .charts import config_hash
+
+
+class CoveringUniqueConstraint(models.UniqueConstraint):
+    """
+    UniqueConstraint whose ``include`` columns are only added where the
+    database supports them (PostgreSQL INCLUDE). Elsewhere (SQLite) it is a
+    plain unique index, where Django would skip the constraint altogether.
+    """
+    def _supported(self, connection):
+        if connection.features.supports_covering_indexes:
+            return self
+        return models.UniqueConstraint(fields=self.fields, name=self.name)
+
+    def constraint_sql(self, model, schema_editor):
+        return models.UniqueConstraint.constraint_sql(self._supported(schema_editor.connection), model, schema_editor)
+
+    def create_sql(self, model, schema_editor):
+        return models.UniqueConstraint.create_sql(self._supported(schema_editor.connection), model, schema_editor)
+
+    def remove_sql(self, model, schema_editor):
+        return models.UniqueConstraint.remove_sql(self._supported(schema_editor.connection), model, schema_editor)
+
+    def _check(self, model, connection):
+        # W039 says the constraint won't be created; this one always is
+        return [error for error in super()._check(model, connection) if error.id != "models.W039"]
+
 
 class Country(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -24,12 +53,32 @@ class Population(models.Model):
 
     class Meta:
         unique_together = ('country', 'year')
-        ordering = ['country__iso_code', 'year']
+        indexes = [
+            # covers the per-capita subquery / summary lookup without a table read
+            models.Index(fields=['country', 'year', 'population'], name='pop_country_year_cov'),
+        ]
 
     def __str__(self):
         return f"{self.country.iso_code} - {self.year}: {self.population}"
 
 
+class EmissionQuerySet(models.QuerySet):
+    def with_population(self):
+        """
+        Annotate each row with the matching country-year population and the
+        per-capita value, so serializing a page costs no extra queries.
+        """
+        population = (
+            Population.objects
+            .filter(country=OuterRef('country'), year=OuterRef('year'))
+            .order_by()
+            .values('population')[:1]
+        )
+        return self.annotate(population=Subquery(population)).annotate(
+            per_capita=F('value') / NullIf(Cast('population', FloatField()), 0.0)
+        )
+
+
 class Emission(models.Model):
     TERRITORIAL = 'territorial'
     CONSUMPTION = 'consumption'
@@ -43,14 +92,42 @@ class Emission(models.Model):
     basis = models.CharField(max_length=20, choices=BASIS_CHOICES)
     value = models.FloatField(help_text="Emissions in metric tonnes CO₂ equivalent")
 
+    objects = EmissionQuerySet.as_manager()
+
     class Meta:
         unique_together = ('country', 'year', 'basis')
-        ordering = ['country__iso_code', 'year']
 
     def __str__(self):
         return f"{self.country.iso_code} - {self.year} ({self.basis})"
     
 
+class CountryYearSummary(models.Model):
+    """
+    Emissions, population and per-capita ratios per country-year, precomputed
+    from Emission and Population (see emissions/summaries.py) so the summary
+    endpoint is a single index lookup. iso_code is denormalized to avoid the
+    join to Country.
+    """
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, related_name='summaries')
+    iso_code = models.CharField(max_length=3)
+    year = models.PositiveIntegerField()
+    territorial = models.FloatField(null=True)
+    consumption = models.FloatField(null=True)
+    population = models.BigIntegerField(null=True)
+    per_capita_territorial = models.FloatField(null=True)
+    per_capita_consumption = models.FloatField(null=True)
+
+    class Meta:
+        unique_together = ('iso_code', 'year')
+        indexes = [
+            # all countries for one year
+            models.Index(fields=['year', 'iso_code'], name='summary_year_iso'),
+        ]
+
+    def __str__(self):
+        return f"{self.iso_code} - {self.year}"
+
+
 class Indicator(models.Model):
     code = models.CharField(max_length=64, unique=True)  # e.g., "co2", "co2_per_capita"
     name = models.CharField(max_length=255)
@@ -71,11 +148,38 @@ class Observation(models.Model):
     value = models.FloatField()
 
     class Meta:
-        unique_together = ("country", "year", "indicator")
-        ordering = ["country__iso_code", "year", "indicator__code"]
+        # No default ordering: sorting on country__iso_code / indicator__code
+        # joins two tables on every scan. Endpoints that need an order ask
+        # for it (see ObservationPagination).
+        constraints = [
+            # One index for uniqueness, the loaders' ON CONFLICT target and the
+            # timeseries / batch reads (country (IN) + indicator IN + year
+            # range); on PostgreSQL value rides along, so reads are index-only.
+            CoveringUniqueConstraint(
+                fields=["country", "indicator", "year"], include=["value"], name="obs_country_ind_year_uniq",
+            ),
+        ]
+        indexes = [
+            # aggregate: one indicator across all countries (sums, rankings,
+            # percentiles). Leads with indicator, which the unique index
+            # cannot serve without scanning every country.
+            models.Index(fields=["indicator", "year", "country", "value"], name="obs_ind_year_country_cov"),
+        ]
 
     def __str__(self):
         return f"{self.country.iso_code}-{self.year}-{self.indicator.code}: {self.value}"
+
+
+class DatasetVersion(models.Model):
+    """What was last loaded from an upstream dataset, for incremental reloads."""
+    source = models.CharField(max_length=64, unique=True)  # e.g. "owid_co2"
+    etag = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)  # sha256 hex
+    version = models.PositiveIntegerField(default=0)
+    loaded_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source} v{self.version}"
     
 
 # User Saving Models
@@ -86,6 +190,25 @@ class Dashboard(models.Model):
                               related_name='dashboards')
     name = models.CharField(max_length=100)
     created = models.DateTimeField(auto_now_add=True)
+    charts = models.ManyToManyField('Chart', through='DashboardChart', related_name='dashboards')
+
+    @property
+    def chart_ids(self):
+        """Chart ids in dashboard order (prefetch ``items`` to avoid a query)."""
+        return [item.chart_id for item in self.items.all()]
+
+
+class DashboardChart(models.Model):
+    """A saved chart's slot on a dashboard."""
+    dashboard = models.ForeignKey(Dashboard, on_delete=models.CASCADE, related_name='items')
+    chart = models.ForeignKey('Chart', on_delete=models.CASCADE, related_name='+')
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['dashboard', 'position'], name='uniq_dashboard_position')
+        ]
 
 
 class Chart(models.Model):
@@ -93,6 +216,9 @@ class Chart(models.Model):
                                 on_delete=models.SET_NULL, related_name='charts')
     name    = models.CharField(max_length=150)
     config  = models.JSONField()
+    # sha256 of the config (charts.config_hash), so listings can say whether
+    # a chart changed without shipping its config
+    config_hash = models.CharField(max_length=64, editable=False, default='')
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -101,6 +227,16 @@ class Chart(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['owner', 'name'], name='uniq_owner_name')
         ]
+        indexes = [
+            # ?mine listing, newest first (ChartPagination)
+            models.Index(fields=['owner', '-updated', '-id'], name='chart_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.config_hash = config_hash(self.config)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'config_hash'}
+        super().save(*args, **kwargs)
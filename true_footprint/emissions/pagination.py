@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset ("seek") pagination over a fixed, unique ordering.
+
+    The cursor is the ordering key of the last row on the page, so fetching
+    page N costs the same as page 1: no OFFSET, no COUNT(*). Fields may be
+    descending ('-updated'); datetimes travel as ISO strings.
+
+    ``?layout=columnar`` returns ``{next, columns: {field: [...]}}`` instead
+    of a list of row objects, so field names are not repeated per row.
+    """
+    ordering = ()
+    page_size = 1000
+    max_page_size = 10000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    layout_query_param = 'layout'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.seek_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                # well-formed JSON whose values don't fit the ordering fields
+                raise NotFound('Invalid cursor')
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.row_key(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.request.query_params.get(self.layout_query_param) == 'columnar':
+            names = list(data[0]) if data else []
+            return Response({
+                'next': self.get_next_link(),
+                'columns': {name: [row[name] for row in data] for name in names},
+            })
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def row_key(self, obj):
+        key = [reduce(getattr, field.lstrip('-').split('__'), obj) for field in self.ordering]
+        return [value.isoformat() if isinstance(value, datetime) else value for value in key]
+
+    def seek_filter(self, position):
+        """(a, b, c) > (x, y, z), spelled out so every backend can use the index."""
+        clause = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[i]})
+            for prev, value in zip(self.ordering[:i], position[:i]):
+                step &= Q(**{prev.lstrip('-'): value})
+            clause |= step
+        return clause
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        return position
+
+
+class ObservationPagination(KeysetPagination):
+    ordering = ('country__iso_code', 'year', 'indicator__code')
+
+
+class EmissionPagination(KeysetPagination):
+    ordering = ('country__iso_code', 'year', 'basis')
+
+
+class ChartPagination(KeysetPagination):
+    ordering = ('-updated', '-id')
+    page_size = 100
+    max_page_size = 1000
@@ -0,0 +1,90 @@
+"""
+Compact response formats for the data endpoints, picked by the Accept header
+or ``?format=``:
+
+    application/msgpack                    ?format=msgpack   (msgpack)
+    application/vnd.apache.arrow.stream    ?format=arrow     (pyarrow)
+
+Both packages are optional; a renderer whose package is missing is left out
+of COMPACT_RENDERERS and the endpoints keep answering JSON.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, use_bin_type=True, default=str)
+
+
+class ArrowRenderer(BaseRenderer):
+    """
+    Arrow IPC stream. Columnar time series ({years, series, units}) become
+    one float64 column per indicator next to an int32 ``year`` column, with
+    units in the schema metadata; row lists (paginated ``results``, tidy
+    ``data`` or plain lists) become one column per field; anything else is a
+    single row.
+    """
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        table = self.to_table(data)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def rows_table(rows):
+        """
+        One column per key found in any row (first seen first); rows lacking
+        a key are null there. Unlike ``Table.from_pylist``, which takes its
+        columns from the first row, this keeps tidy series that start late.
+        """
+        names = list(dict.fromkeys(key for row in rows for key in row))
+        return pa.table({name: [row.get(name) for row in rows] for name in names})
+
+    def to_table(self, data):
+        if isinstance(data, list):
+            return self.rows_table(data)
+        meta = {}
+        if "units" in data:
+            meta["units"] = json.dumps(data["units"])
+        if "series" in data and "years" in data:
+            columns = {"year": pa.array(data["years"], pa.int32())}
+            columns.update({code: pa.array(values, pa.float64()) for code, values in data["series"].items()})
+            return pa.table(columns, metadata=meta)
+        for key in ("results", "data"):
+            if isinstance(data.get(key), list):
+                if data.get("next"):
+                    meta["next"] = data["next"]
+                return self.rows_table(data[key]).replace_schema_metadata(meta or None)
+        return self.rows_table([data])
+
+
+COMPACT_RENDERERS = [
+    renderer for renderer, module in ((MessagePackRenderer, msgpack), (ArrowRenderer, pa)) if module is not None
+]
@@ -0,0 +1,123 @@
+"""
+In-memory autocomplete over countries and indicators (``/api/autocomplete/``).
+
+Each entry's fields (country name and ISO code; indicator code, name and
+unit) are lower-cased and indexed twice:
+
+  - a sorted list of (term, entry) pairs, whole fields and their words,
+    so a prefix lookup is a bisect plus a short scan;
+  - a trigram -> entries map, for infix and slightly misspelled queries.
+
+Matches rank exact field > field prefix > word prefix > trigram overlap,
+then shorter labels first; recent results are memoized per index. Like
+the cube, the index belongs to a dataset version: a loader run bumps the
+version and the next search rebuilds it.
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+
+from .cache import OBSERVATIONS, dataset_version
+from .models import Country, Indicator
+
+KINDS = ("country", "indicator")
+WORD = re.compile(r"[a-z0-9]+")
+MIN_TRIGRAM_SHARE = 0.5
+
+_lock = threading.Lock()
+_index = None
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, entries, version=None):
+        """``entries`` are (kind, payload, label, fields) tuples."""
+        self.version = version
+        self.kinds = [kind for kind, _, _, _ in entries]
+        self.payloads = [payload for _, payload, _, _ in entries]
+        self.labels = [label for _, _, label, _ in entries]
+
+        terms = set()
+        grams = {}
+        for eid, (_, _, _, fields) in enumerate(entries):
+            for field in filter(None, ((f or "").lower().strip() for f in fields)):
+                terms.add((field, eid, True))
+                terms.update((word, eid, False) for word in WORD.findall(field) if word != field)
+                for gram in trigrams(field):
+                    grams.setdefault(gram, set()).add(eid)
+        self.terms = sorted(terms)
+        self.keys = [term for term, _, _ in self.terms]
+        self.grams = grams
+        # keystrokes repeat the same prefixes; results are never mutated
+        self.search = lru_cache(maxsize=4096)(self.search)
+
+    @classmethod
+    def build(cls, version=None):
+        entries = [
+            ("country", {"kind": "country", "id": pk, "iso_code": iso, "name": name}, name, (iso, name))
+            for pk, iso, name in Country.objects.values_list("id", "iso_code", "name")
+        ]
+        entries += [
+            ("indicator", {"kind": "indicator", "id": pk, "code": code, "name": name, "unit": unit},
+             name, (code, name, unit))
+            for pk, code, name, unit in Indicator.objects.values_list("id", "code", "name", "unit")
+        ]
+        return cls(entries, version)
+
+    def search(self, query, kind=None, limit=10):
+        """Payloads of the best ``limit`` matches for ``query``, best first."""
+        query = query.lower().strip()
+        if not query:
+            return []
+        scores = {}
+        lo = bisect_left(self.keys, query)
+        hi = bisect_left(self.keys, query + "\uffff", lo)
+        for term, eid, whole in self.terms[lo:hi]:
+            if kind and self.kinds[eid] != kind:
+                continue
+            score = (3 if term == query else 2) if whole else 1
+            if score > scores.get(eid, 0):
+                scores[eid] = score
+
+        if len(scores) < limit and len(query) >= 3:
+            wanted = trigrams(query)
+            shared = Counter(eid for gram in wanted for eid in self.grams.get(gram, ()))
+            for eid, count in shared.items():
+                share = count / len(wanted)
+                if eid not in scores and share >= MIN_TRIGRAM_SHARE and (not kind or self.kinds[eid] == kind):
+                    scores[eid] = share  # always below a prefix match
+
+        best = heapq.nsmallest(limit, scores, key=lambda eid: (-scores[eid], len(self.labels[eid]), self.labels[eid]))
+        return [self.payloads[eid] for eid in best]
+
+
+def get_index():
+    """The search index for the current dataset version, rebuilt after a load."""
+    global _index
+    version, _ = dataset_version(OBSERVATIONS)
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = SearchIndex.build(version)
+            index = _index
+    return index
+
+
+def reset_index():
+    global _index
+    _index = None
+
+
+def clear_memo():
+    """Forget memoized results but keep the index (for cold benchmarks)."""
+    index = _index
+    if index is not None:
+        index.search.cache_clear()
@@ -1,5 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Country, Emission, Population, Dashboard, Chart, Indicator, Observation
+from .models import Country, Emission, Dashboard, DashboardChart, Chart, Indicator, Observation
 
 
 class CountrySerializer(serializers.ModelSerializer):
@@ -11,29 +12,15 @@ class CountrySerializer(serializers.ModelSerializer):
 class EmissionSerializer(serializers.ModelSerializer):
     country = CountrySerializer(read_only=True)
 
-    population = serializers.SerializerMethodField()
-    per_capita = serializers.SerializerMethodField()
+    # Annotated onto the queryset by EmissionViewSet (see with_population()).
+    population = serializers.IntegerField(read_only=True)
+    per_capita = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Emission
         fields = ['id', 'country', 'year', 'basis', 'value', 'population', 'per_capita']
 
 
-    def get_population(self, obj):
-        pop = Population.objects.filter(
-            country=obj.country,
-            year=obj.year
-        ).first()
-        return pop.population if pop else None
-
-
-    def get_per_capita(self, obj):
-        pop_val = self.get_population(obj)
-        if pop_val:
-            return obj.value / pop_val
-        return None
-
-
 class IndicatorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Indicator
@@ -54,14 +41,52 @@ class ChartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Chart
-        fields = ['id', 'name', 'config', 'owner', 'created', 'updated']
+        fields = ['id', 'name', 'config', 'config_hash', 'owner', 'created', 'updated']
 
     def get_owner(self, obj):
         return obj.owner.username if obj.owner else None
 
 
+class ChartListSerializer(ChartSerializer):
+    """Listing row: no config, just its hash to tell when a cached copy is stale."""
+    class Meta(ChartSerializer.Meta):
+        fields = ['id', 'name', 'owner', 'updated', 'config_hash']
+
+
 class DashboardSerializer(serializers.ModelSerializer):
-    charts = ChartSerializer(many=True, read_only=True)
+    """A dashboard's charts are an ordered list of saved chart ids."""
+    charts = serializers.ListField(child=serializers.IntegerField(), source='chart_ids', required=False)
+
     class Meta:
         model = Dashboard
-        fields = ['id', 'name', 'charts']
\ No newline at end of file
+        fields = ['id', 'name', 'charts', 'created']
+
+    def validate_charts(self, ids):
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('A chart can appear only once.')
+        found = set(Chart.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        unknown = [pk for pk in ids if pk not in found]
+        if unknown:
+            raise serializers.ValidationError(f'Unknown chart ids: {unknown}')
+        return ids
+
+    @transaction.atomic
+    def create(self, validated_data):
+        ids = validated_data.pop('chart_ids', [])
+        dashboard = super().create(validated_data)
+        self.set_charts(dashboard, ids)
+        return dashboard
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        ids = validated_data.pop('chart_ids', None)
+        dashboard = super().update(instance, validated_data)
+        if ids is not None:
+            self.set_charts(dashboard, ids)
+        return dashboard
+
+    def set_charts(self, dashboard, ids):
+        dashboard.items.all().delete()
+        DashboardChart.objects.bulk_create(
+            [DashboardChart(dashboard=dashboard, chart_id=pk, position=i) for i, pk in enumerate(ids)]
+        )
\ No newline at end of file
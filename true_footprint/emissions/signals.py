@@ -0,0 +1,35 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Emission, Population
+from .summaries import refresh_summaries
+
+# (country_id, year) pairs touched by this thread since its last refresh
+_pending = threading.local()
+
+
+@receiver([post_save, post_delete], sender=Emission)
+@receiver([post_save, post_delete], sender=Population)
+def refresh_country_year_summary(sender, instance, raw=False, **kwargs):
+    """
+    Queue the row's pair and refresh once the transaction commits, so a
+    cascade or a loop of saves costs one refresh and one version bump.
+    """
+    if raw:  # loaddata
+        return
+    if getattr(_pending, "pairs", None) is None:
+        _pending.pairs = set()
+    _pending.pairs.add((instance.country_id, instance.year))
+    # The first callback to run refreshes every queued pair; the rest find
+    # nothing left. Pairs queued by a rolled-back transaction ride along
+    # with the next commit, which is harmless.
+    transaction.on_commit(flush_pending_summaries)
+
+
+def flush_pending_summaries():
+    pairs, _pending.pairs = getattr(_pending, "pairs", None), set()
+    if pairs:
+        refresh_summaries(pairs)
@@ -0,0 +1,96 @@
+"""
+Maintenance of the CountryYearSummary table.
+
+refresh_summaries() recomputes rows from Emission and Population, either for
+the given (country_id, year) pairs or for everything, and upserts them in
+bulk. Saving or deleting Emission/Population rows through the ORM
+refreshes their pairs automatically, once per transaction on commit (see
+signals.py). Code that bulk-loads
+those tables should call refresh_summaries() itself, or run
+``manage.py rebuild_summaries`` afterwards.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cache import SUMMARY_SOURCE, bump_dataset_version
+from .models import Country, CountryYearSummary, DatasetVersion, Emission, Population
+
+SOURCE = SUMMARY_SOURCE
+SUMMARY_FIELDS = [
+    "territorial", "consumption", "population", "per_capita_territorial", "per_capita_consumption",
+]
+
+
+def _per_capita(value, population):
+    return value / population if (value is not None and population) else None
+
+
+def _pairs_filter(pairs):
+    """One clause per year keeps the OR short for bulk refreshes."""
+    by_year = {}
+    for country_id, year in pairs:
+        by_year.setdefault(year, set()).add(country_id)
+    q = Q()
+    for year, country_ids in by_year.items():
+        q |= Q(year=year, country_id__in=sorted(country_ids))
+    return q
+
+
+def compute_summaries(pairs=None):
+    """
+    Build unsaved CountryYearSummary rows for ``pairs`` (or every pair that
+    has emissions or population data). Returns (rows, empty_pairs), where
+    empty_pairs no longer have any source data.
+    """
+    emissions = Emission.objects.all()
+    populations = Population.objects.all()
+    if pairs is not None:
+        pairs = set(pairs)
+        emissions = emissions.filter(_pairs_filter(pairs))
+        populations = populations.filter(_pairs_filter(pairs))
+
+    values = {}
+    for country_id, year, basis, value in emissions.values_list("country_id", "year", "basis", "value"):
+        values.setdefault((country_id, year), {})[basis] = value
+    for country_id, year, population in populations.values_list("country_id", "year", "population"):
+        values.setdefault((country_id, year), {})["population"] = population
+
+    isos = dict(Country.objects.filter(id__in={c for c, _ in values}).values_list("id", "iso_code"))
+    rows = []
+    for (country_id, year), v in values.items():
+        terr, cons, pop = v.get(Emission.TERRITORIAL), v.get(Emission.CONSUMPTION), v.get("population")
+        rows.append(CountryYearSummary(
+            country_id=country_id,
+            iso_code=isos[country_id],
+            year=year,
+            territorial=terr,
+            consumption=cons,
+            population=pop,
+            per_capita_territorial=_per_capita(terr, pop),
+            per_capita_consumption=_per_capita(cons, pop),
+        ))
+    empty = (pairs - set(values)) if pairs is not None else set()
+    return rows, empty
+
+
+def refresh_summaries(pairs=None, batch_size=5000):
+    """Recompute and upsert summaries; ``pairs=None`` rebuilds the whole table."""
+    rows, empty = compute_summaries(pairs)
+    with transaction.atomic():
+        if pairs is None:
+            CountryYearSummary.objects.all().delete()
+        elif empty:
+            CountryYearSummary.objects.filter(_pairs_filter(empty)).delete()
+        CountryYearSummary.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["iso_code", "year"],
+            update_fields=["country", *SUMMARY_FIELDS],
+        )
+        # Summaries feed cached endpoints: record a new dataset version
+        state, _ = DatasetVersion.objects.get_or_create(source=SOURCE)
+        DatasetVersion.objects.filter(pk=state.pk).update(version=F("version") + 1, loaded_at=timezone.now())
+    bump_dataset_version()
+    return len(rows)
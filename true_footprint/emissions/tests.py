@@ -1,3 +1,1101 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import re
+import tempfile
+import threading
+import zipfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, resolve
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import benchmarks, dashboards, urls
+from .aggregates import indicator_rows
+from .cache import OBSERVATIONS, bump_dataset_version, dataset_version
+from .charts import normalize_config
+from .cube import IndicatorCube, get_cube, reset_cube, write_snapshot
+from .ingest import CsvLayout
+from .loaders import IndicatorSource
+from .middleware import brotli
+from .models import Chart, Country, CountryYearSummary, DatasetVersion, Emission, Indicator, Observation, Population
+from .renderers import msgpack, pa
+from .search import reset_index
+from .summaries import SUMMARY_FIELDS, refresh_summaries
+from .timeseries import batch_rows, observation_rows
+from .views import ObservationViewSet
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cube()
+        reset_index()
+        self.client = APIClient()
+
+    def read_queries(self):
+        """
+        Warm the dataset version (and the cube, when enabled) and return the
+        queries one time-series/summary read costs: one, or none from the cube.
+        """
+        dataset_version()
+        return 0 if get_cube() is not None else 1
+
+
+class EmissionListQueryCountTests(ApiTestCase):
+    def _seed(self, n_countries, years=range(2000, 2005)):
+        start = Country.objects.count()
+        for i in range(start, start + n_countries):
+            country = Country.objects.create(name=f'Country {i}', iso_code=f'C{i:02d}')
+            for year in years:
+                Population.objects.create(country=country, year=year, population=1000 + i)
+                for basis in (Emission.TERRITORIAL, Emission.CONSUMPTION):
+                    Emission.objects.create(country=country, year=year, basis=basis, value=500.0)
+
+    def test_list_query_count_is_independent_of_row_count(self):
+        self._seed(2)
+        with self.assertNumQueries(1):
+            small = self.client.get('/api/emissions/')
+        self._seed(10)
+        with self.assertNumQueries(1):
+            large = self.client.get('/api/emissions/')
+        self.assertEqual(len(small.data['results']), 20)
+        self.assertEqual(len(large.data['results']), 120)
+
+    def test_population_and_per_capita_are_annotated(self):
+        country = Country.objects.create(name='Aland', iso_code='ALA')
+        Population.objects.create(country=country, year=2000, population=200)
+        Emission.objects.create(country=country, year=2000, basis=Emission.TERRITORIAL, value=50.0)
+        Emission.objects.create(country=country, year=2001, basis=Emission.TERRITORIAL, value=50.0)
+
+        rows = self.client.get('/api/emissions/', {'country__iso_code': 'ALA'}).data['results']
+        self.assertEqual(rows[0]['population'], 200)
+        self.assertEqual(rows[0]['per_capita'], 0.25)
+        self.assertIsNone(rows[1]['population'])
+        self.assertIsNone(rows[1]['per_capita'])
+
+
+class ObservationListPaginationTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        indicators = [Indicator.objects.create(code=code, name=code) for code in ('co2', 'gdp')]
+        for iso in ('AAA', 'BBB', 'CCC'):
+            country = Country.objects.create(name=iso, iso_code=iso)
+            for year in (1990, 1991):
+                for ind in indicators:
+                    Observation.objects.create(country=country, year=year, indicator=ind, value=year)
+
+    def test_keyset_pages_cover_every_row_in_natural_order(self):
+        seen = []
+        url = '/api/observations/?page_size=5'
+        while url:
+            page = self.client.get(url).data
+            self.assertLessEqual(len(page['results']), 5)
+            seen += [(r['country'], r['year'], r['indicator']) for r in page['results']]
+            url = page['next']
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/observations/', {'cursor': 'nope'}).status_code, 404)
+
+    def test_forged_cursor_is_404(self):
+        for position in (['AAA', 'x', 'co2'], ['AAA', None, 'co2'], ['AAA', [1], 'co2']):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            self.assertEqual(self.client.get('/api/observations/', {'cursor': cursor}).status_code, 404, position)
+
+    def test_ndjson_stream(self):
+        response = self.client.get('/api/observations/', {'stream': 'ndjson', 'country__iso_code': 'BBB'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(set(rows[0]), {'id', 'country', 'year', 'indicator', 'value'})
+
+    def test_csv_stream(self):
+        response = self.client.get('/api/observations/', {'stream': 'csv', 'indicator__code': 'gdp'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,country,year,indicator,value')
+        self.assertEqual(len(lines), 7)
+
+    def test_unknown_stream_format(self):
+        self.assertEqual(self.client.get('/api/observations/', {'stream': 'xml'}).status_code, 400)
+
+
+class TimeseriesTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Bravo', iso_code='BRV')
+        co2 = Indicator.objects.create(code='co2', name='CO2', unit='Mt CO₂')
+        gdp = Indicator.objects.create(code='gdp', name='GDP', unit='intl-$ (PPP)')
+        Observation.objects.create(country=country, year=2000, indicator=co2, value=1.0)
+        Observation.objects.create(country=country, year=2001, indicator=co2, value=2.0)
+        Observation.objects.create(country=country, year=2001, indicator=gdp, value=9.0)
+        Observation.objects.create(country=country, year=2002, indicator=gdp, value=8.0)
+
+    def test_tidy_layout_in_one_query(self):
+        with self.assertNumQueries(self.read_queries()):
+            response = self.client.get('/api/observations/timeseries/', {
+                'country__iso_code': 'BRV', 'indicators': 'co2,gdp', 'year_max': 2001,
+            })
+        self.assertEqual(response.data['data'], [
+            {'year': 2000, 'co2': 1.0},
+            {'year': 2001, 'co2': 2.0, 'gdp': 9.0},
+        ])
+        self.assertEqual(response.data['units'], {'co2': 'Mt CO₂', 'gdp': 'intl-$ (PPP)'})
+
+    def test_columnar_layout(self):
+        response = self.client.get('/api/observations/timeseries/', {
+            'country__iso_code': 'BRV', 'indicators': 'gdp,co2', 'layout': 'columnar',
+        })
+        self.assertEqual(response.data['years'], [2000, 2001, 2002])
+        self.assertEqual(response.data['series'], {
+            'gdp': [None, 9.0, 8.0],
+            'co2': [1.0, 2.0, None],
+        })
+
+    def test_requires_country_and_indicators(self):
+        response = self.client.get('/api/observations/timeseries/', {'indicators': 'co2'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_integer_years(self):
+        for path, params in (
+            ('/api/observations/timeseries/', {'country__iso_code': 'BRV', 'indicators': 'co2', 'year_min': 'abc'}),
+            ('/api/observations/timeseries/batch/', {'countries': 'BRV', 'indicators': 'co2', 'year_max': '2001.5'}),
+            ('/api/async/observations/timeseries/', {'country__iso_code': 'BRV', 'indicators': 'co2', 'year_min': 'x'}),
+        ):
+            self.assertEqual(self.client.get(path, params).status_code, 400, path)
+
+
+class TimeseriesBatchTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        co2 = Indicator.objects.create(code='co2', name='CO2', unit='Mt CO₂')
+        for iso, years in (('AAA', (2000, 2001)), ('BBB', (2001, 2002)), ('CCC', ())):
+            country = Country.objects.create(name=iso, iso_code=iso)
+            for year in years:
+                Observation.objects.create(country=country, year=year, indicator=co2, value=year - 2000)
+
+    def test_many_countries_in_one_query(self):
+        with self.assertNumQueries(self.read_queries()):
+            response = self.client.get('/api/observations/timeseries/batch/', {
+                'countries': 'BBB,AAA,CCC', 'indicators': 'co2',
+            })
+        self.assertEqual(response.data, {
+            'years': [2000, 2001, 2002],
+            'units': {'co2': 'Mt CO₂'},
+            'countries': {
+                'BBB': {'co2': [None, 1.0, 2.0]},
+                'AAA': {'co2': [0.0, 1.0, None]},
+            },
+        })
+
+    def test_cell_cap(self):
+        with mock.patch.object(ObservationViewSet, 'batch_max_cells', 3):
+            response = self.client.get('/api/observations/timeseries/batch/', {
+                'countries': 'AAA,BBB', 'indicators': 'co2',
+            })
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTests(ApiTestCase):
+    params = {'country__iso_code': 'CHE', 'indicators': 'co2'}
+
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Switzerland', iso_code='CHE')
+        co2 = Indicator.objects.create(code='co2', name='CO2')
+        Observation.objects.create(country=country, year=2000, indicator=co2, value=1.0)
+        DatasetVersion.objects.create(source='owid_co2', version=1, loaded_at='2026-01-01T00:00:00Z')
+
+    def get(self, **headers):
+        return self.client.get('/api/observations/timeseries/', self.params, **headers)
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.get()
+        with self.assertNumQueries(0):
+            second = self.get()
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first['Last-Modified'], 'Thu, 01 Jan 2026 00:00:00 GMT')
+
+    def test_conditional_get_returns_304(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        since = self.get(HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2026 00:00:00 GMT')
+        self.assertEqual(since.status_code, 304)
+
+    def test_bumped_dataset_version_invalidates(self):
+        etag = self.get()['ETag']
+        Observation.objects.update(value=2.0)
+        DatasetVersion.objects.update(version=2)
+        self.assertEqual(self.get().data['data'], [{'year': 2000, 'co2': 1.0}])  # still cached
+
+        bump_dataset_version()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data'], [{'year': 2000, 'co2': 2.0}])
+
+    def test_oversized_payloads_are_not_cached(self):
+        with override_settings(RESPONSE_CACHE_MAX_BYTES=50):
+            first = self.get()
+            with self.assertNumQueries(1):
+                second = self.get()
+            self.client.get('/api/async/observations/timeseries/', self.params)
+            with self.assertNumQueries(1):
+                self.client.get('/api/async/observations/timeseries/', self.params)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_errors_are_not_cached(self):
+        self.client.get('/api/observations/timeseries/', {'indicators': 'co2'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/observations/timeseries/', {'indicators': 'co2'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+
+class ChartDataTests(ApiTestCase):
+    config = {'country': 'che', 'range': {'start': '2000', 'end': None}, 'metrics': ['co2', 'gdp', 'co2']}
+
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Switzerland', iso_code='CHE')
+        co2 = Indicator.objects.create(code='co2', name='CO2', unit='Mt CO₂')
+        Indicator.objects.create(code='gdp', name='GDP')
+        Observation.objects.create(country=country, year=1999, indicator=co2, value=0.5)
+        Observation.objects.create(country=country, year=2000, indicator=co2, value=1.0)
+        owner = User.objects.create_user('owner')
+        cls.chart = Chart.objects.create(owner=owner, name='Swiss CO2', config=cls.config)
+        cls.twin = Chart.objects.create(owner=owner, name='Copy', config={**cls.config, 'country': 'CHE'})
+
+    def get(self, chart, **params):
+        return self.client.get(f'/api/charts/{chart.id}/data/', params)
+
+    def test_series_from_normalized_config(self):
+        response = self.get(self.chart)
+        self.assertEqual(response.data['config'], {
+            'country': 'CHE', 'range': {'start': 2000, 'end': None}, 'metrics': ['co2', 'gdp'],
+        })
+        self.assertEqual(response.data['data'], [{'year': 2000, 'co2': 1.0}])
+        self.assertEqual(response.data['units']['co2'], 'Mt CO₂')
+        columnar = self.get(self.chart, layout='columnar')
+        self.assertEqual(columnar.data['series'], {'co2': [1.0]})
+
+    def test_same_config_shares_cache_entry(self):
+        first = self.get(self.chart)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get(self.twin)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(len(queries), 1)  # the chart row only
+        self.assertNotIn('observation', queries[0]['sql'])
+
+    def test_invalid_config(self):
+        self.chart.config = {'country': 'CHE', 'metrics': []}
+        self.chart.save()
+        self.assertEqual(self.get(self.chart).status_code, 400)
+
+    def test_malformed_range(self):
+        for span in ([1990, 2000], 'x', {'start': 1990.5}, {'end': 'soon'}, {'start': True}):
+            self.chart.config = {**self.config, 'range': span}
+            self.chart.save()
+            response = self.get(self.chart)
+            self.assertEqual(response.status_code, 400, span)
+            self.assertIn('range', response.data['detail'])
+
+
+class ChartListTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owners = [User.objects.create_user(f'user{i}') for i in range(3)]
+        for i in range(6):
+            Chart.objects.create(owner=cls.owners[i % 3], name=f'chart {i}', config={'metrics': ['co2'], 'n': i})
+
+    def test_slim_rows_without_n_plus_one(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/charts/')
+        first = response.data['results'][0]
+        self.assertEqual(set(first), {'id', 'name', 'owner', 'updated', 'config_hash'})
+        self.assertEqual(first['owner'], 'user2')
+        self.assertEqual(first['config_hash'], Chart.objects.get(pk=first['id']).config_hash)
+        self.assertIn('config', self.client.get(f"/api/charts/{first['id']}/").data)
+
+    def test_keyset_pages_newest_first(self):
+        Chart.objects.filter(name='chart 0').update(updated=Chart.objects.get(name='chart 1').updated)
+        names, url = [], '/api/charts/?page_size=4'
+        while url:
+            page = self.client.get(url).data
+            names += [row['name'] for row in page['results']]
+            url = page['next']
+        expected = list(Chart.objects.order_by('-updated', '-id').values_list('name', flat=True))
+        self.assertEqual(names, expected)
+
+    def test_forged_cursor_is_404(self):
+        cursor = base64.urlsafe_b64encode(json.dumps(['yesterday', 1]).encode()).decode()
+        self.assertEqual(self.client.get('/api/charts/', {'cursor': cursor}).status_code, 404)
+
+    def test_config_hash_follows_config(self):
+        chart = Chart.objects.get(name='chart 0')
+        before = chart.config_hash
+        chart.config = {'metrics': ['gdp']}
+        chart.save(update_fields=['config'])
+        chart.refresh_from_db()
+        self.assertNotEqual(chart.config_hash, before)
+
+
+class DashboardTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        co2 = Indicator.objects.create(code='co2', name='CO2', unit='Mt CO₂')
+        gdp = Indicator.objects.create(code='gdp', name='GDP')
+        for iso in ('AAA', 'BBB'):
+            country = Country.objects.create(name=iso, iso_code=iso)
+            for year in (2000, 2001):
+                Observation.objects.create(country=country, year=year, indicator=co2, value=year - 1999)
+                Observation.objects.create(country=country, year=year, indicator=gdp, value=10.0)
+        cls.owner = User.objects.create_user('owner')
+        cls.charts = [
+            Chart.objects.create(owner=cls.owner, name='a co2', config={'country': 'AAA', 'metrics': ['co2']}),
+            Chart.objects.create(owner=cls.owner, name='a gdp 2001', config={
+                'country': 'AAA', 'range': {'start': 2001}, 'metrics': ['gdp'],
+            }),
+            Chart.objects.create(owner=cls.owner, name='b co2', config={'country': 'BBB', 'metrics': ['co2']}),
+            Chart.objects.create(owner=cls.owner, name='broken', config={'metrics': ['co2']}),
+            Chart.objects.create(owner=cls.owner, name='bad range', config={
+                'country': 'AAA', 'range': [2000, 2001], 'metrics': ['co2'],
+            }),
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def create(self, charts):
+        response = self.client.post('/api/dashboards/', {'name': 'Mine', 'charts': charts}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_ordered_charts_round_trip(self):
+        ids = [c.id for c in reversed(self.charts)]
+        dashboard = self.create(ids)
+        self.assertEqual(dashboard['charts'], ids)
+        response = self.client.patch(f"/api/dashboards/{dashboard['id']}/", {'charts': ids[:2]}, format='json')
+        self.assertEqual(response.data['charts'], ids[:2])
+
+    def test_rejects_unknown_and_repeated_charts(self):
+        for charts in ([999], [self.charts[0].id] * 2):
+            response = self.client.post('/api/dashboards/', {'name': 'Bad', 'charts': charts}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_render_merges_queries_per_country(self):
+        dashboard = self.create([c.id for c in self.charts])
+        per_country = self.read_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/dashboards/{dashboard['id']}/render/")
+        observation_queries = [q for q in queries if 'emissions_observation' in q['sql']]
+        self.assertEqual(len(observation_queries), 2 * per_country)
+
+        charts = response.data['charts']
+        self.assertEqual([c['name'] for c in charts], ['a co2', 'a gdp 2001', 'b co2', 'broken', 'bad range'])
+        self.assertEqual(charts[0]['data'], [{'year': 2000, 'co2': 1.0}, {'year': 2001, 'co2': 2.0}])
+        self.assertEqual(charts[1]['data'], [{'year': 2001, 'gdp': 10.0}])
+        self.assertIn('error', charts[3])
+        self.assertEqual(charts[4]['error'], 'Chart config range must be an object.')
+        single = self.client.get(f'/api/charts/{self.charts[1].id}/data/')
+        self.assertEqual({k: charts[1][k] for k in single.data}, single.data)
+
+    def test_render_reuses_chart_cache(self):
+        for chart in self.charts[:3]:
+            self.client.get(f'/api/charts/{chart.id}/data/')
+        dashboard = self.create([c.id for c in self.charts])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/api/dashboards/{dashboard['id']}/render/")
+        self.assertFalse([q for q in queries if 'emissions_observation' in q['sql']])
+        # the dashboard, then its items joined to their charts
+        self.assertEqual(len(queries), 2)
+
+    def test_only_owner_can_render(self):
+        dashboard = self.create([self.charts[0].id])
+        self.client.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(f"/api/dashboards/{dashboard['id']}/render/").status_code, 404)
+
+
+@override_settings(INDICATOR_CUBE=True)
+class CubeDashboardTests(DashboardTests):
+    pass
+
+
+class DashboardThreadPoolTests(TransactionTestCase):
+    def test_countries_fetched_on_pool(self):
+        co2 = Indicator.objects.create(code='co2', name='CO2')
+        configs = {}
+        for i, iso in enumerate(('AAA', 'BBB', 'CCC')):
+            country = Country.objects.create(name=iso, iso_code=iso)
+            Observation.objects.create(country=country, year=2000, indicator=co2, value=i)
+            configs[i] = normalize_config({'country': iso, 'metrics': ['co2']})
+
+        threads = set()
+        rows = dashboards.country_rows
+        queries = benchmarks.QueryCounter()
+        with mock.patch.object(dashboards, 'country_rows', side_effect=lambda *a: threads.add(
+                threading.current_thread().name) or rows(*a)), connection.execute_wrapper(queries):
+            payloads = dashboards.compute_payloads(configs, 'tidy')
+        self.assertEqual([payloads[i]['data'] for i in range(3)], [[{'year': 2000, 'co2': float(i)}] for i in range(3)])
+        self.assertTrue(all(name.startswith('dashboard-render') for name in threads))
+        # the request connection's execute wrappers see the pool's queries
+        self.assertEqual(queries.count, 3)
+        self.assertFalse(connection.execute_wrappers)
+
+
+class AuthenticationCostTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Country.objects.create(name='Alpha', iso_code='AAA')
+        cls.user = User.objects.create_user('reader')
+
+    def bearer(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_public_endpoints_ignore_tokens(self):
+        self.client.get('/api/countries/')
+        self.bearer(AccessToken.for_user(self.user))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/countries/').status_code, 200)
+        self.bearer('not-a-token')
+        self.assertEqual(self.client.get('/api/countries/').status_code, 200)
+
+    def test_token_user_is_cached(self):
+        self.bearer(AccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth-check/').data['user'], 'reader')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth-check/').data['user'], 'reader')
+        self.bearer('not-a-token')
+        self.assertEqual(self.client.get('/api/auth-check/').status_code, 401)
+
+    def test_cache_holds_no_secrets(self):
+        self.user.set_password('hunter2')
+        self.user.save()
+        token = AccessToken.for_user(self.user)
+        self.bearer(token)
+        self.client.get('/api/auth-check/')
+        key = f"emissions:auth:{hashlib.sha256(str(token).encode()).hexdigest()}"
+        entry = pickle.dumps(cache.get(key))
+        self.assertNotIn(self.user.password.encode(), entry)
+        self.assertNotIn(settings.SECRET_KEY.encode(), entry)
+
+
+class AutocompleteTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for iso, name in (('DEU', 'Germany'), ('GEO', 'Georgia'), ('NER', 'Niger'), ('NGA', 'Nigeria')):
+            Country.objects.create(name=name, iso_code=iso)
+        Indicator.objects.create(code='co2', name='Annual CO2 emissions', unit='million tonnes')
+        Indicator.objects.create(code='gdp', name='Gross domestic product', unit='international-$')
+
+    def search(self, **params):
+        return self.client.get('/api/autocomplete/', params).data['results']
+
+    def test_ranked_matches(self):
+        self.assertEqual([r['name'] for r in self.search(q='ge', kind='country')], ['Georgia', 'Germany'])
+        self.assertEqual(self.search(q='ner')[0]['iso_code'], 'NER')  # exact code before 'Niger' infix
+        self.assertEqual([r['code'] for r in self.search(q='emiss')], ['co2'])  # word prefix
+        self.assertEqual([r['code'] for r in self.search(q='tonnes', kind='indicator')], ['co2'])  # unit
+        self.assertIn('DEU', [r.get('iso_code') for r in self.search(q='germny')])  # trigram
+        self.assertEqual(self.search(q=''), [])
+
+    def test_index_is_reused_until_a_load(self):
+        self.search(q='ge')
+        with self.assertNumQueries(0):
+            self.search(q='ni')
+        Country.objects.create(name='Ghana', iso_code='GHA')
+        DatasetVersion.objects.create(source='owid_co2', version=1)
+        bump_dataset_version()
+        self.assertEqual(self.search(q='gha')[0]['name'], 'Ghana')
+
+    def test_limit_and_kind_validation(self):
+        self.assertEqual(len(self.search(q='n', limit=1)), 1)
+        self.assertEqual(self.client.get('/api/autocomplete/', {'q': 'g', 'kind': 'city'}).status_code, 400)
+
+
+class CountryYearSummaryTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            for iso, pop in (('DEU', 80), ('FRA', 0)):
+                country = Country.objects.create(name=iso, iso_code=iso)
+                Population.objects.create(country=country, year=2010, population=pop)
+                Emission.objects.create(country=country, year=2010, basis=Emission.TERRITORIAL, value=800.0)
+            Emission.objects.create(country=Country.objects.get(iso_code='DEU'), year=2010,
+                                    basis=Emission.CONSUMPTION, value=960.0)
+
+    def test_summary_is_one_lookup(self):
+        with self.assertNumQueries(self.read_queries()):
+            response = self.client.get('/api/emissions/summary/', {'country__iso_code': 'DEU', 'year': 2010})
+        self.assertEqual(response.data, {
+            'country': 'DEU', 'year': 2010, 'territorial': 800.0, 'consumption': 960.0,
+            'population': 80, 'per_capita_territorial': 10.0, 'per_capita_consumption': 12.0,
+        })
+
+    def test_summary_without_data_and_unknown_country(self):
+        response = self.client.get('/api/emissions/summary/', {'country__iso_code': 'DEU', 'year': 1900})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['territorial'])
+        response = self.client.get('/api/emissions/summary/', {'country__iso_code': 'XXX', 'year': 2010})
+        self.assertEqual(response.status_code, 404)
+
+    def test_saving_emission_refreshes_summary(self):
+        emission = Emission.objects.get(country__iso_code='DEU', basis=Emission.TERRITORIAL)
+        emission.value = 400.0
+        with self.captureOnCommitCallbacks(execute=True):
+            emission.save()
+        self.assertEqual(CountryYearSummary.objects.get(iso_code='DEU', year=2010).per_capita_territorial, 5.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Population.objects.filter(country__iso_code='DEU').delete()  # queryset delete still sends post_delete
+        self.assertIsNone(CountryYearSummary.objects.get(iso_code='DEU', year=2010).population)
+
+    def test_edits_refresh_once_per_transaction(self):
+        versions = DatasetVersion.objects.filter(source='country_year_summary')
+        before = versions.get().version
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for emission in Emission.objects.all():
+                    emission.value += 1
+                    emission.save()
+                Population.objects.all().delete()
+        self.assertEqual(versions.get().version, before + 1)
+        self.assertEqual(CountryYearSummary.objects.get(iso_code='DEU', year=2010).consumption, 961.0)
+
+    def test_summary_refresh_keeps_observation_scope(self):
+        observations = dataset_version(OBSERVATIONS)
+        everything = dataset_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Emission.objects.filter(basis=Emission.CONSUMPTION).get().delete()
+        self.assertEqual(dataset_version(OBSERVATIONS), observations)
+        self.assertNotEqual(dataset_version(), everything)
+
+    def test_summary_all_countries_for_year(self):
+        response = self.client.get('/api/emissions/summary/all/', {'year': 2010})
+        self.assertEqual([r['country'] for r in response.data['results']], ['DEU', 'FRA'])
+        self.assertIsNone(response.data['results'][1]['per_capita_territorial'])
+
+    def test_rebuild_command(self):
+        CountryYearSummary.objects.all().delete()
+        call_command('rebuild_summaries', stdout=io.StringIO())
+        self.assertEqual(CountryYearSummary.objects.count(), 2)
+
+
+class AggregateTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        co2 = Indicator.objects.create(code='co2', name='CO2')
+        series = {
+            'AAA': {2000: 1.0, 2001: 2.0, 2002: 4.0},
+            'BBB': {2000: 10.0, 2002: 10.0},
+            'CCC': {2001: 5.0, 2002: 7.0},
+        }
+        for iso, values in series.items():
+            country = Country.objects.create(name=iso, iso_code=iso)
+            for year, value in values.items():
+                Observation.objects.create(country=country, year=year, indicator=co2, value=value)
+
+    def agg(self, **params):
+        response = self.client.get('/api/observations/aggregate/', {'indicator': 'co2', **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_yearly_sum(self):
+        data = self.agg(stat='sum', year_min=2001)
+        self.assertEqual((data['years'], data['values']), ([2001, 2002], [7.0, 21.0]))
+
+    def test_ranking_defaults_to_latest_year(self):
+        data = self.agg(stat='rank', top=2)
+        self.assertEqual(data['year'], 2002)
+        self.assertEqual((data['countries'], data['values']), (['BBB', 'CCC'], [10.0, 7.0]))
+
+    def test_percentiles(self):
+        data = self.agg(stat='percentile', q='0,50,100')
+        self.assertEqual(data['percentiles']['50'], [5.5, 3.5, 7.0])
+        self.assertEqual(data['percentiles']['100'], [10.0, 5.0, 10.0])
+
+    def test_cagr(self):
+        data = self.agg(stat='cagr')
+        self.assertEqual(data['countries'], ['AAA', 'CCC', 'BBB'])
+        self.assertAlmostEqual(data['values'][0], 1.0)
+        self.assertEqual((data['start_years'][1], data['end_years'][1]), (2001, 2002))
+
+    def test_rolling_mean(self):
+        data = self.agg(stat='rolling', window=2, countries='BBB,AAA')
+        self.assertEqual(data['years'], [2000, 2001, 2002])
+        self.assertEqual(data['countries']['AAA'], [1.0, 1.5, 3.0])
+        self.assertEqual(data['countries']['BBB'], [10.0, 10.0, 10.0])
+        self.assertNotIn('CCC', data['countries'])
+
+    def test_bad_parameters(self):
+        for params in ({'stat': 'median'}, {'stat': 'rolling', 'window': 0}, {'q': '120', 'stat': 'percentile'}):
+            response = self.client.get('/api/observations/aggregate/', {'indicator': 'co2', **params})
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(INDICATOR_CUBE=True)
+class CubeTimeseriesTests(TimeseriesTests):
+    pass
+
+
+@override_settings(INDICATOR_CUBE=True)
+class CubeTimeseriesBatchTests(TimeseriesBatchTests):
+    pass
+
+
+@override_settings(INDICATOR_CUBE=True)
+class CubeSummaryTests(CountryYearSummaryTests):
+    def test_saving_emission_rebuilds_cube(self):
+        self.client.get('/api/emissions/summary/', {'country__iso_code': 'DEU', 'year': 2010})
+        cube = get_cube()
+        with self.captureOnCommitCallbacks(execute=True):
+            Emission.objects.filter(country__iso_code='DEU', basis=Emission.TERRITORIAL).get().delete()
+        response = self.client.get('/api/emissions/summary/', {'country__iso_code': 'DEU', 'year': 2010})
+        self.assertIsNone(response.data['territorial'])
+        self.assertIs(get_cube().values, cube.values)  # observation block kept
+
+
+@override_settings(INDICATOR_CUBE=True)
+class CubeAggregateTests(AggregateTests):
+    pass
+
+
+def is_mapped(array):
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    base = array.base.obj if isinstance(array.base, memoryview) else array.base
+    return isinstance(base, mmap.mmap)
+
+
+class AsyncReadTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Alpha', iso_code='AAA')
+        co2 = Indicator.objects.create(code='co2', name='CO2', unit='Mt CO₂')
+        Indicator.objects.create(code='gdp', name='GDP')
+        Observation.objects.create(country=country, year=2000, indicator=co2, value=1.5)
+        Emission.objects.create(country=country, year=2000, basis=Emission.TERRITORIAL, value=3.0)
+
+    def assertSameJson(self, sync_path, async_path, params=None):
+        expected = self.client.get(sync_path, params, HTTP_ACCEPT='application/json')
+        actual = self.client.get(async_path, params)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.json(), expected.json())
+        return actual
+
+    def test_same_payloads_as_sync_views(self):
+        self.assertSameJson('/api/countries/', '/api/async/countries/')
+        self.assertSameJson('/api/indicators/', '/api/async/indicators/', {'code': 'gdp'})
+        for layout in ('tidy', 'columnar'):
+            self.assertSameJson('/api/observations/timeseries/', '/api/async/observations/timeseries/',
+                                {'country__iso_code': 'AAA', 'indicators': 'co2', 'layout': layout})
+        for iso in ('AAA', 'ZZZ'):
+            self.assertSameJson('/api/emissions/summary/', '/api/async/emissions/summary/',
+                                {'country__iso_code': iso, 'year': 2000})
+        self.assertSameJson('/api/observations/timeseries/', '/api/async/observations/timeseries/',
+                            {'indicators': 'co2'})
+
+    @override_settings(INDICATOR_CUBE=True)
+    def test_cube_backed(self):
+        self.assertSameJson('/api/observations/timeseries/', '/api/async/observations/timeseries/',
+                            {'country__iso_code': 'AAA', 'indicators': 'co2,gdp'})
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/async/countries/')
+        again = self.client.get('/api/async/countries/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class CompactFormatTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Alpha', iso_code='AAA')
+        for code in ('co2', 'gdp'):
+            indicator = Indicator.objects.create(code=code, name=code, unit='u')
+            for year in range(1900, 2000):
+                Observation.objects.create(country=country, year=year, indicator=indicator, value=year / 7)
+
+    params = {'country__iso_code': 'AAA', 'indicators': 'co2,gdp', 'layout': 'columnar'}
+
+    @skipUnless(msgpack, 'msgpack not installed')
+    def test_msgpack(self):
+        expected = self.client.get('/api/observations/timeseries/', self.params, HTTP_ACCEPT='application/json')
+        response = self.client.get('/api/observations/timeseries/', self.params, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), expected.json())
+        self.assertLess(len(response.content), len(expected.content))
+
+    @skipUnless(pa, 'pyarrow not installed')
+    def test_arrow(self):
+        response = self.client.get('/api/observations/timeseries/', {**self.params, 'format': 'arrow'})
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column_names, ['year', 'co2', 'gdp'])
+        self.assertEqual(str(table.schema.field('co2').type), 'double')
+        self.assertEqual(table.column('year').to_pylist()[:2], [1900, 1901])
+        self.assertEqual(json.loads(table.schema.metadata[b'units']), {'co2': 'u', 'gdp': 'u'})
+
+        response = self.client.get('/api/observations/', {'page_size': 5, 'format': 'arrow'})
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.num_rows, 5)
+        self.assertIn(b'next', table.schema.metadata)
+
+    @skipUnless(pa, 'pyarrow not installed')
+    def test_arrow_tidy_keeps_series_missing_from_first_row(self):
+        late = Indicator.objects.create(code='late', name='late', unit='u')
+        Observation.objects.create(country=Country.objects.get(), year=1950, indicator=late, value=1.0)
+        response = self.client.get('/api/observations/timeseries/', {
+            'country__iso_code': 'AAA', 'indicators': 'late,co2', 'format': 'arrow',
+        })
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column_names, ['year', 'co2', 'late'])
+        self.assertEqual(table.column('late').null_count, 99)
+        self.assertEqual(table.column('late')[50].as_py(), 1.0)
+
+    def test_columnar_observation_list(self):
+        response = self.client.get('/api/observations/', {'page_size': 3, 'layout': 'columnar'})
+        self.assertEqual(response.data['columns']['year'], [1900, 1900, 1901])
+        self.assertEqual(response.data['columns']['indicator'], ['co2', 'gdp', 'co2'])
+        self.assertIsNotNone(response.data['next'])
+
+    @skipUnless(brotli, 'brotli not installed')
+    def test_brotli_then_gzip(self):
+        response = self.client.get('/api/observations/timeseries/', self.params, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(brotli.decompress(response.content))['years']), 100)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/api/observations/timeseries/', self.params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['years']), 100)
+
+        again = self.client.get('/api/observations/timeseries/', self.params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    @skipUnless(brotli, 'brotli not installed')
+    def test_pages_with_secrets_stay_on_gzip(self):
+        response = self.client.get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'csrfmiddlewaretoken', gzip.decompress(response.content))
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_small_run_is_machine_readable(self):
+        stats = benchmarks.seed(countries=3, indicators=2, years=range(2000, 2004), charts=5)
+        self.assertEqual(stats['loader']['cells'], stats['dataset']['cells'])
+        results = benchmarks.measure(repeat=2)
+
+        self.assertEqual({r['status'] for r in results.values()}, {200})
+        self.assertLessEqual(results['observations-timeseries']['queries'], 2)
+        self.assertLessEqual({'auth-check', 'dashboards-list', 'dashboards-detail', 'dashboards-render'}, set(results))
+        for name, path, params in benchmarks.endpoints():
+            if name.startswith('autocomplete-'):
+                self.assertTrue(self.client.get(path, params).data['results'], name)
+        self.assertEqual(set(results['countries-list']), {
+            'path', 'status', 'queries', 'bytes', 'p50_ms', 'p95_ms', 'warm_p50_ms',
+        })
+        json.dumps(results)
+
+    def test_covers_every_read_route(self):
+        def routes(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from routes(pattern.url_patterns)
+                else:
+                    yield pattern
+
+        benchmarks.seed(countries=2, indicators=1, years=range(2000, 2002), charts=1)
+        covered = {resolve(path).func for _, path, _ in benchmarks.endpoints()}
+        missing = {p.name or str(p.pattern) for p in routes(urls.urlpatterns) if p.callback not in covered}
+        self.assertEqual(missing, {'chart-upsert'})
+
+    def test_compare_flags_more_queries(self):
+        before = {'endpoints': {'a': {'queries': 1, 'p50_ms': 2.0}}}
+        after = {'endpoints': {'a': {'queries': 3, 'p50_ms': 2.1}, 'b': {'queries': 1, 'p50_ms': 1.0}}}
+        lines, regressions = benchmarks.compare(before, after)
+        self.assertEqual(regressions, ['a'])
+        self.assertIn('new', lines[1])
+
+
+class CubeSnapshotTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'cube.bin')
+        country = Country.objects.create(name='Alpha', iso_code='AAA')
+        self.co2 = Indicator.objects.create(code='co2', name='CO2', unit='Mt CO₂')
+        Observation.objects.create(country=country, year=2000, indicator=self.co2, value=1.5)
+
+    def test_snapshot_round_trip_is_memory_mapped(self):
+        built = write_snapshot(self.path)
+        cube = IndicatorCube.open(self.path)
+        self.assertEqual(cube.version, built.version)
+        self.assertFalse(cube.values.flags.writeable)
+        self.assertTrue(is_mapped(cube.values))
+        self.assertEqual(cube.timeseries('AAA', ['co2']), built.timeseries('AAA', ['co2']))
+
+    def test_workers_pick_up_a_replaced_snapshot(self):
+        with override_settings(INDICATOR_CUBE=True, INDICATOR_SNAPSHOT=self.path):
+            write_snapshot(self.path)
+            reset_cube()
+            bump_dataset_version()
+            with self.assertNumQueries(1):  # the dataset version; arrays come from the file
+                self.assertTrue(is_mapped(get_cube().values))
+
+            Observation.objects.filter(year=2000).update(value=2.5)
+            DatasetVersion.objects.create(source='owid_co2', version=1)
+            write_snapshot(self.path)  # another process: new file, no cache bump here
+            response = self.client.get('/api/observations/timeseries/', {
+                'country__iso_code': 'AAA', 'indicators': 'co2', 'layout': 'columnar',
+            })
+        self.assertEqual(response.data['series'], {'co2': [2.5]})
+
+    def test_summary_edit_keeps_snapshot_mapped(self):
+        with override_settings(INDICATOR_CUBE=True, INDICATOR_SNAPSHOT=self.path):
+            write_snapshot(self.path)
+            reset_cube()
+            self.assertTrue(is_mapped(get_cube().values))
+            with self.captureOnCommitCallbacks(execute=True):
+                Emission.objects.create(country=Country.objects.get(), year=2000, basis=Emission.TERRITORIAL, value=7.0)
+            cube = get_cube()
+            self.assertTrue(is_mapped(cube.values))
+            self.assertEqual(cube.summary('AAA', 2000)['territorial'], 7.0)
+
+    def test_load_command_writes_snapshot(self):
+        with mock.patch('emissions.loaders.requests.get', return_value=owid_response()):
+            call_command('load_owid_co2', '--snapshot', self.path, stdout=io.StringIO())
+        cube = IndicatorCube.open(self.path)
+        self.assertEqual(cube.timeseries('BBB', ['gdp'])['series'], {'gdp': [300.0]})
+
+
+OWID_CSV = """country,year,iso_code,co2,gdp
+Alpha,2000,AAA,1.5,100
+Alpha,2001,AAA,2.5,
+World,2000,OWID_WRL,99,
+Beta,2000,BBB,,300
+"""
+
+
+def owid_response(body=OWID_CSV, status=200, etag='"v1"'):
+    response = mock.MagicMock(status_code=status, headers={'ETag': etag})
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [body.encode()]
+    return response
+
+
+class LoadOwidCo2Tests(TestCase):
+    def load(self, *args, response=None):
+        out = io.StringIO()
+        with mock.patch('emissions.loaders.requests.get',
+                        return_value=response or owid_response()) as get:
+            call_command('load_owid_co2', *args, stdout=out)
+        return out.getvalue(), get
+
+    def test_initial_load(self):
+        out, _ = self.load()
+        self.assertIn('4 inserted, 0 updated, 0 unchanged', out)
+        self.assertEqual(Country.objects.count(), 2)
+        self.assertEqual(
+            Observation.objects.get(country__iso_code='AAA', year=2001, indicator__code='co2').value, 2.5
+        )
+        state = DatasetVersion.objects.get(source='owid_co2')
+        self.assertEqual((state.etag, state.version), ('"v1"', 1))
+
+    def test_reload_upserts_only_revised_cells(self):
+        self.load()
+        revised = OWID_CSV.replace('Alpha,2001,AAA,2.5,', 'Alpha,2001,AAA,3.5,110')
+        out, _ = self.load(response=owid_response(revised, etag='"v2"'))
+        self.assertIn('1 inserted, 1 updated, 3 unchanged', out)
+        self.assertEqual(
+            Observation.objects.get(country__iso_code='AAA', year=2001, indicator__code='co2').value, 3.5
+        )
+
+    def test_diff_reads_only_the_chunk_indicators(self):
+        other = Indicator.objects.create(code='other', name='other')
+        alpha = Country.objects.create(name='Alpha', iso_code='AAA')
+        Observation.objects.create(country=alpha, year=2000, indicator=other, value=5.0)
+        with CaptureQueriesContext(connection) as queries:
+            self.load('--chunksize', '1')
+        read = set()
+        for query in queries:
+            match = re.search(r'"indicator_id" IN \(([\d, ]+)\)', query['sql'])
+            if query['sql'].startswith('SELECT') and match:
+                read.update(int(pk) for pk in match.group(1).split(','))
+        self.assertEqual(read, set(Indicator.objects.filter(code__in=['co2', 'gdp']).values_list('id', flat=True)))
+
+    def test_incremental_skips_unchanged_dataset(self):
+        self.load()
+        out, get = self.load('--incremental', response=owid_response(status=304))
+        self.assertIn('unchanged', out)
+        self.assertEqual(get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+
+        out, _ = self.load('--incremental', response=owid_response(etag='"other"'))
+        self.assertIn('nothing to do', out)
+        self.assertEqual(DatasetVersion.objects.get(source='owid_co2').version, 1)
+
+    def test_failed_load_rolls_back(self):
+        with mock.patch('emissions.loaders.BulkLoader.upsert',
+                        side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.load()
+        self.assertFalse(Country.objects.exists())
+        self.assertFalse(Indicator.objects.exists())
+        self.assertEqual(DatasetVersion.objects.get(source='owid_co2').version, 0)
+
+    def test_local_gzip_file_in_small_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'owid.csv.gz')
+            with gzip.open(path, 'wt') as fh:
+                fh.write(OWID_CSV)
+            out, get = self.load('--file', path, '--chunksize', '1')
+        get.assert_not_called()
+        self.assertIn('4 inserted, 0 updated, 0 unchanged', out)
+        self.assertEqual(DatasetVersion.objects.get(source='owid_co2').etag, '')
+
+    def test_local_zip_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'owid.zip')
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('owid-co2-data.csv', OWID_CSV)
+            out, _ = self.load('--file', path)
+            self.assertIn('4 inserted, 0 updated, 0 unchanged', out)
+
+            with zipfile.ZipFile(path, 'a') as archive:
+                archive.writestr('codebook.csv', 'column,description\n')
+            with self.assertRaisesMessage(CommandError, 'found 2'):
+                self.load('--file', path)
+
+    def test_process_pool_matches_inline_load(self):
+        out, _ = self.load('--workers', '2', '--chunksize', '1', '--batch-size', '2')
+        self.assertIn('4 inserted, 0 updated, 0 unchanged', out)
+        self.assertIn('x 2', out)
+        self.assertEqual(
+            sorted(Observation.objects.values_list('country__iso_code', 'year', 'indicator__code', 'value')),
+            [('AAA', 2000, 'co2', 1.5), ('AAA', 2000, 'gdp', 100.0),
+             ('AAA', 2001, 'co2', 2.5), ('BBB', 2000, 'gdp', 300.0)],
+        )
+
+
+WORLD_BANK_CSV = """Country Name,Country Code,Indicator Code,2000,2001
+Alpha,aaa,EN.CO2,1.0,..
+World,WLD1,EN.CO2,9.0,9.5
+Beta,BBB,EN.POP,5,6
+"""
+
+
+class WorldBankStyleSource(IndicatorSource):
+    name = 'test_wb'
+    label = 'Test WB'
+    layout = CsvLayout(country_col='Country Name', iso_col='Country Code', year_col=None,
+                       indicator_col='Indicator Code')
+    units = {'EN.POP': 'people'}
+
+
+class LoadIndicatorsTests(TestCase):
+    def test_year_column_layout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'wb.csv')
+            with open(path, 'w') as fh:
+                fh.write(WORLD_BANK_CSV)
+            out = io.StringIO()
+            with mock.patch.dict('emissions.loaders.SOURCES', {'test_wb': WorldBankStyleSource}):
+                call_command('load_indicators', 'test_wb', '--file', path, stdout=out)
+
+        self.assertIn('3 inserted, 0 updated, 0 unchanged', out.getvalue())
+        self.assertEqual(
+            sorted(Observation.objects.values_list('country__iso_code', 'year', 'indicator__code', 'value')),
+            [('AAA', 2000, 'EN.CO2', 1.0), ('BBB', 2000, 'EN.POP', 5.0), ('BBB', 2001, 'EN.POP', 6.0)],
+        )
+        self.assertEqual(Indicator.objects.get(code='EN.POP').unit, 'people')
+        self.assertTrue(DatasetVersion.objects.filter(source='test_wb', version=1).exists())
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class AccessPathIndexTests(TestCase):
+    """
+    The hot read queries are answered from the intended index: index-only
+    on PostgreSQL, where the unique index INCLUDEs value.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        indicators = [Indicator.objects.create(code=f'ind{i}', name=f'ind{i}') for i in range(5)]
+        for c in range(10):
+            country = Country.objects.create(name=f'C{c}', iso_code=f'C{c:02d}')
+            Observation.objects.bulk_create([
+                Observation(country=country, year=year, indicator=ind, value=year)
+                for ind in indicators for year in range(1950, 2000)
+            ])
+            Population.objects.bulk_create([
+                Population(country=country, year=year, population=100) for year in range(1950, 2000)
+            ])
+            Emission.objects.bulk_create([
+                Emission(country=country, year=year, basis=basis, value=1.0)
+                for year in range(1950, 2000) for basis in (Emission.TERRITORIAL, Emission.CONSUMPTION)
+            ])
+        refresh_summaries()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, table, index, index_only=True):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            # no INCLUDE on SQLite, so only the search itself is checked
+            lines = [line for line in plan.splitlines() if f' {table} ' in line]
+            self.assertTrue(lines, plan)
+            for line in lines:
+                self.assertIn(f'INDEX {index} ', line, plan)
+        elif connection.vendor == 'postgresql':
+            scan = 'Index Only Scan' if index_only else 'Index Scan'
+            self.assertIn(f'{scan} using {index}', plan, plan)
+
+    def test_timeseries(self):
+        self.assertUsesIndex(
+            observation_rows('C03', ['ind1', 'ind4'], 1960, 1990),
+            'emissions_observation', 'obs_country_ind_year_uniq',
+        )
+
+    def test_timeseries_batch(self):
+        self.assertUsesIndex(
+            batch_rows(['C01', 'C02', 'C07'], ['ind0', 'ind2']),
+            'emissions_observation', 'obs_country_ind_year_uniq',
+        )
+
+    def test_aggregate(self):
+        self.assertUsesIndex(
+            indicator_rows('ind2', 1960).values('year').annotate(total=Sum('value')),
+            'emissions_observation', 'obs_ind_year_country_cov',
+        )
+
+    def test_summary(self):
+        # EmissionViewSet.summary's lookup: one row by the (iso_code, year) unique index
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, CountryYearSummary._meta.db_table)
+        index = next(name for name, c in constraints.items() if c['unique'] and c['columns'] == ['iso_code', 'year'])
+        self.assertUsesIndex(
+            CountryYearSummary.objects.filter(iso_code='C05', year=1970).values(*SUMMARY_FIELDS).order_by('pk')[:1],
+            'emissions_countryyearsummary', index, index_only=False,
+        )
+
+    def test_observation_scan_does_not_join_for_default_ordering(self):
+        self.assertNotIn('JOIN', str(Observation.objects.all().query))
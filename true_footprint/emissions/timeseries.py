@@ -0,0 +1,111 @@
+"""
+Pivot helpers shared by the time-series endpoints.
+
+Everything works on flat ``(year, code, unit, value)`` tuples straight from
+``values_list()`` so a request costs one query and never builds model
+instances.
+"""
+from .cube import get_cube
+from .models import Observation
+
+
+def year_bounds(params):
+    """(year_min, year_max) from query params as ints or None; ValueError if not integers."""
+    return tuple(int(params[name]) if params.get(name) else None for name in ("year_min", "year_max"))
+
+
+def columnar_series(iso, codes, year_min=None, year_max=None):
+    """pivot_columnar() of one country's indicators, from the cube when it is enabled."""
+    cube = get_cube()
+    if cube is not None:
+        return cube.timeseries(iso, codes, year_min, year_max)
+    return pivot_columnar(observation_rows(iso, codes, year_min, year_max), codes)
+
+
+def observation_rows(iso, codes, year_min=None, year_max=None):
+    qs = Observation.objects.filter(country__iso_code=iso, indicator__code__in=codes)
+    if year_min is not None:
+        qs = qs.filter(year__gte=year_min)
+    if year_max is not None:
+        qs = qs.filter(year__lte=year_max)
+    return qs.order_by("year").values_list("year", "indicator__code", "indicator__unit", "value")
+
+
+def pivot_columnar(rows, codes):
+    """
+    Single pass over year-ordered rows into
+    ``{"years": [...], "series": {code: [...]}, "units": {...}}``,
+    with ``None`` wherever an indicator has no value for a year.
+    """
+    years = []
+    cells = {}
+    units = {}
+    for year, code, unit, value in rows:
+        if not years or years[-1] != year:
+            years.append(year)
+        cells[(year, code)] = value
+        units[code] = unit
+
+    series = {
+        code: [cells.get((year, code)) for year in years]
+        for code in codes if code in units
+    }
+    return {"years": years, "series": series, "units": units}
+
+
+def columnar_to_tidy(columnar):
+    """[{year, <code1>: val, ...}, ...] as returned by the original endpoint."""
+    data = []
+    for i, year in enumerate(columnar["years"]):
+        row = {"year": year}
+        for code, values in columnar["series"].items():
+            if values[i] is not None:
+                row[code] = values[i]
+        data.append(row)
+    return data
+
+
+def chart_payload(config, columnar, layout="tidy"):
+    """A saved chart's series in the timeseries endpoint's layouts, next to its normalized config."""
+    if layout == "columnar":
+        return {"config": config, **columnar}
+    return {"config": config, "data": columnar_to_tidy(columnar), "units": columnar["units"]}
+
+
+def batch_rows(isos, codes, year_min=None, year_max=None):
+    qs = Observation.objects.filter(country__iso_code__in=isos, indicator__code__in=codes)
+    if year_min is not None:
+        qs = qs.filter(year__gte=year_min)
+    if year_max is not None:
+        qs = qs.filter(year__lte=year_max)
+    return qs.order_by("year").values_list(
+        "country__iso_code", "year", "indicator__code", "indicator__unit", "value"
+    )
+
+
+def pivot_batch(rows, isos, codes):
+    """
+    Many countries on one shared year axis:
+    ``{"years": [...], "units": {...}, "countries": {iso: {code: [...]}}}``.
+    Countries or indicators without any data are left out.
+    """
+    years = []
+    cells = {}
+    units = {}
+    present = set()
+    for iso, year, code, unit, value in rows:
+        if not years or years[-1] != year:
+            years.append(year)
+        cells[(iso, year, code)] = value
+        units[code] = unit
+        present.add((iso, code))
+
+    countries = {}
+    for iso in isos:
+        series = {
+            code: [cells.get((iso, year, code)) for year in years]
+            for code in codes if (iso, code) in present
+        }
+        if series:
+            countries[iso] = series
+    return {"years": years, "units": units, "countries": countries}
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CountryViewSet, EmissionViewSet, IndicatorViewSet, ObservationViewSet, ChartViewSet, auth_check
+from . import async_views
+from .views import CountryViewSet, EmissionViewSet, IndicatorViewSet, ObservationViewSet, ChartViewSet, DashboardViewSet, auth_check, autocomplete
 
 router = DefaultRouter()
 router.register(r'countries', CountryViewSet)
@@ -8,8 +9,14 @@ router.register(r'emissions', EmissionViewSet)
 router.register(r'indicators', IndicatorViewSet)
 router.register(r'observations', ObservationViewSet)
 router.register(r'charts', ChartViewSet)
+router.register(r'dashboards', DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('auth-check/', auth_check)
+    path('auth-check/', auth_check),
+    path('autocomplete/', autocomplete),
+    path('async/countries/', async_views.country_list),
+    path('async/indicators/', async_views.indicator_list),
+    path('async/observations/timeseries/', async_views.timeseries),
+    path('async/emissions/summary/', async_views.summary),
 ]
\ No newline at end of file
@@ -1,10 +1,21 @@
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Country, Emission, Population, Dashboard, Chart, Indicator, Observation
-from .serializers import CountrySerializer, EmissionSerializer, DashboardSerializer, ChartSerializer, IndicatorSerializer, ObservationSerializer
+from .models import Country, CountryYearSummary, Emission, Dashboard, DashboardChart, Chart, Indicator, Observation
+from .serializers import CountrySerializer, EmissionSerializer, DashboardSerializer, ChartSerializer, ChartListSerializer, IndicatorSerializer, ObservationSerializer
+from . import aggregates, dashboards, search
+from .cache import OBSERVATIONS, cache_response, dataset_version, keyed_response
+from .charts import data_key, normalize_config
+from .cube import get_cube
+from .pagination import ChartPagination, EmissionPagination, ObservationPagination
+from .renderers import COMPACT_RENDERERS
+from .streaming import StreamingListMixin
+from .summaries import SUMMARY_FIELDS
+from .timeseries import batch_rows, chart_payload, columnar_series, columnar_to_tidy, pivot_batch, year_bounds
 
 
 @api_view(['GET'])
@@ -13,6 +24,25 @@ def auth_check(request):
     return Response({'ok': True, 'user': request.user.username})
 
 
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def autocomplete(request):
+    """
+    Ranked matches over country names and ISO codes and indicator codes,
+    names and units: ?q=ger&kind=country|indicator&limit=10.
+    """
+    query = request.query_params.get('q', '')
+    kind = request.query_params.get('kind') or None
+    if kind is not None and kind not in search.KINDS:
+        return Response({'detail': f"kind must be one of {', '.join(search.KINDS)}."}, status=400)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response({'detail': 'limit must be an integer.'}, status=400)
+    return Response({'results': search.get_index().search(query, kind, limit)})
+
+
 class IsAuthenticatedOrReadOnly(permissions.IsAuthenticatedOrReadOnly):
     pass
 
@@ -24,23 +54,52 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.owner_id == getattr(request.user, 'id', None)
 
 
-class CountryViewSet(viewsets.ReadOnlyModelViewSet):
+class PublicReadMixin:
+    """
+    Open data: requests are not authenticated at all, so a bearer token
+    sent along costs no JWT verification or User query.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+
+class CountryViewSet(PublicReadMixin, viewsets.ReadOnlyModelViewSet):
     """List and retrieve countries"""
     queryset = Country.objects.all()
+    dataset_scope = OBSERVATIONS  # cache_response: unaffected by summary refreshes
     serializer_class = CountrySerializer
     filter_backends = [DjangoFilterBackend]
     search_fields = ['name', 'iso_code']
 
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
-class EmissionViewSet(viewsets.ReadOnlyModelViewSet):
+class EmissionViewSet(PublicReadMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     """List and filter emissions"""
-    queryset = Emission.objects.select_related('country').all()
+    queryset = Emission.objects.select_related('country').with_population()
     serializer_class = EmissionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['country__iso_code', 'year', 'basis']
+    pagination_class = EmissionPagination
+    stream_fields = {
+        'id': 'id',
+        'country': 'country__iso_code',
+        'year': 'year',
+        'basis': 'basis',
+        'value': 'value',
+        'population': 'population',
+        'per_capita': 'per_capita',
+    }
 
 
     @action(detail=False, methods=['get'], url_path='summary')
+    @cache_response
     def summary(self, request):
         iso  = request.query_params.get('country__iso_code')
         year = request.query_params.get('year')
@@ -50,104 +109,249 @@ class EmissionViewSet(viewsets.ReadOnlyModelViewSet):
               status=400
             )
 
-        # lookup
         try:
-            country = Country.objects.get(iso_code=iso)
-        except Country.DoesNotExist:
-            return Response({'detail': 'Country not found.'}, status=404)
-
-        # territorial & consumption
-        terr = Emission.objects.filter(
-            country=country, year=year, basis=Emission.TERRITORIAL
-        ).first()
-        cons = Emission.objects.filter(
-            country=country, year=year, basis=Emission.CONSUMPTION
-        ).first()
-
-        # population
-        pop_obj = Population.objects.filter(
-            country=country, year=year
-        ).first()
-        pop_val = pop_obj.population if pop_obj else None
-
-        # build payload
+            year = int(year)
+        except ValueError:
+            return Response({'detail': 'year must be an integer.'}, status=400)
+
+        cube = get_cube()
+        if cube is not None:
+            if iso not in cube.iso_index:
+                return Response({'detail': 'Country not found.'}, status=404)
+            return Response({'country': iso, 'year': year, **cube.summary(iso, year)})
+
+        # one (iso_code, year) index lookup on the precomputed table
+        row = CountryYearSummary.objects.filter(iso_code=iso, year=year).values(*SUMMARY_FIELDS).first()
+        if row is None:
+            if not Country.objects.filter(iso_code=iso).exists():
+                return Response({'detail': 'Country not found.'}, status=404)
+            row = dict.fromkeys(SUMMARY_FIELDS)
+
+        return Response({'country': iso, 'year': year, **row})
+
+    @action(detail=False, methods=['get'], url_path='summary/all')
+    @cache_response
+    def summary_all(self, request):
+        """Summaries for every country with data in ?year=, ordered by ISO code."""
+        try:
+            year = int(request.query_params.get('year', ''))
+        except ValueError:
+            return Response({'detail': 'year is required and must be an integer.'}, status=400)
+
+        cube = get_cube()
+        if cube is not None:
+            return Response({
+                'year': year,
+                'results': [{'country': iso, **fields} for iso, fields in cube.summaries_for_year(year)],
+            })
+
+        rows = (
+            CountryYearSummary.objects.filter(year=year)
+            .order_by('iso_code')
+            .values('iso_code', *SUMMARY_FIELDS)
+        )
         return Response({
-          'country': iso,
-          'year': int(year),
-          'territorial': terr.value if terr else None,
-          'consumption': cons.value if cons else None,
-          'population': pop_val,
-          'per_capita_territorial':
-              (terr.value / pop_val) if (terr and pop_val) else None,
-          'per_capita_consumption':
-              (cons.value / pop_val) if (cons and pop_val) else None,
+            'year': year,
+            'results': [{'country': r.pop('iso_code'), **r} for r in rows],
         })
 
 
-class IndicatorViewSet(viewsets.ReadOnlyModelViewSet):
+class IndicatorViewSet(PublicReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Indicator.objects.all()
+    dataset_scope = OBSERVATIONS
     serializer_class = IndicatorSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["code"]
 
-class ObservationViewSet(viewsets.ReadOnlyModelViewSet):
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class ObservationViewSet(PublicReadMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Observation.objects.select_related("country", "indicator")
+    dataset_scope = OBSERVATIONS
     serializer_class = ObservationSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["country__iso_code", "indicator__code", "year"]
+    pagination_class = ObservationPagination
+    # JSON plus MessagePack / Arrow IPC via Accept or ?format=
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *COMPACT_RENDERERS]
+    stream_fields = {
+        "id": "id",
+        "country": "country__iso_code",
+        "year": "year",
+        "indicator": "indicator__code",
+        "value": "value",
+    }
+    # upper bound on (country, year, indicator) cells a batch request may return
+    batch_max_cells = 250_000
 
     @action(detail=False, methods=["get"], url_path="timeseries")
+    @cache_response
     def timeseries(self, request):
         """
         Returns a tidy array [{year, <code1>: val, <code2>: val, ...}, ...]
         plus a units map for the selected indicators.
+
+        With ?layout=columnar the payload is {years: [...], series: {code: [...]},
+        units: {...}} instead, aligned on years with nulls for gaps.
         """
         iso = request.query_params.get("country__iso_code")
         codes_csv = request.query_params.get("indicators", "")
-        year_min = request.query_params.get("year_min")
-        year_max = request.query_params.get("year_max")
+        layout = request.query_params.get("layout", "tidy")
 
         if not iso or not codes_csv:
             return Response({"detail": "country__iso_code and indicators are required."}, status=400)
+        if layout not in ("tidy", "columnar"):
+            return Response({"detail": "layout must be 'tidy' or 'columnar'."}, status=400)
+        try:
+            year_min, year_max = year_bounds(request.query_params)
+        except ValueError:
+            return Response({"detail": "year_min and year_max must be integers."}, status=400)
 
         codes = [c.strip() for c in codes_csv.split(",") if c.strip()]
-        qs = self.get_queryset().filter(country__iso_code=iso, indicator__code__in=codes)
-        if year_min:
-            qs = qs.filter(year__gte=year_min)
-        if year_max:
-            qs = qs.filter(year__lte=year_max)
+        columnar = columnar_series(iso, codes, year_min, year_max)
+
+        if layout == "columnar":
+            return Response(columnar)
+        return Response({"data": columnar_to_tidy(columnar), "units": columnar["units"]})
+
+    @action(detail=False, methods=["get"], url_path="timeseries/batch")
+    @cache_response
+    def timeseries_batch(self, request):
+        """
+        Many countries x many indicators in one query, on a shared year axis:
+        {years: [...], units: {...}, countries: {iso: {code: [...]}}}.
+        """
+        isos_csv = request.query_params.get("countries", "")
+        codes_csv = request.query_params.get("indicators", "")
+
+        isos = list(dict.fromkeys(c.strip() for c in isos_csv.split(",") if c.strip()))
+        codes = list(dict.fromkeys(c.strip() for c in codes_csv.split(",") if c.strip()))
+        if not isos or not codes:
+            return Response({"detail": "countries and indicators are required."}, status=400)
+        try:
+            year_min, year_max = year_bounds(request.query_params)
+        except ValueError:
+            return Response({"detail": "year_min and year_max must be integers."}, status=400)
 
-        qs = qs.order_by("year", "indicator__code")
-        years = sorted({o.year for o in qs})
-        rows_by_year = {y: {"year": y} for y in years}
-        for o in qs:
-            rows_by_year[o.year][o.indicator.code] = o.value
-        data = [rows_by_year[y] for y in years]
+        cube = get_cube()
+        if cube is not None:
+            cells, payload = cube.batch(isos, codes, year_min, year_max)
+        else:
+            rows = list(batch_rows(isos, codes, year_min, year_max)[:self.batch_max_cells + 1])
+            cells = len(rows)
+            payload = pivot_batch(rows, isos, codes) if cells <= self.batch_max_cells else None
+        if cells > self.batch_max_cells:
+            return Response(
+                {"detail": f"Request exceeds {self.batch_max_cells} cells; narrow countries, indicators or years."},
+                status=400
+            )
+        return Response(payload)
 
-        units = {ind.code: ind.unit for ind in Indicator.objects.filter(code__in=codes)}
-        return Response({"data": data, "units": units})
+    @action(detail=False, methods=["get"], url_path="aggregate")
+    @cache_response
+    def aggregate(self, request):
+        """
+        Aggregates over one indicator as compact arrays:
+
+          ?stat=sum|mean                  totals / means across countries per year
+          ?stat=rank&year=&top=20         top countries in a year (latest if omitted)
+          ?stat=percentile&q=10,50,90     cross-country percentiles per year
+          ?stat=cagr&top=                 growth rate between first and last year per country
+          ?stat=rolling&window=5          trailing mean per country
+
+        All accept indicator (required), year_min, year_max and countries=ISO,ISO.
+        """
+        params = request.query_params
+        code = params.get("indicator")
+        stat = params.get("stat", "sum")
+        if not code:
+            return Response({"detail": "indicator is required."}, status=400)
+        if stat not in aggregates.STATS:
+            return Response({"detail": f"stat must be one of {', '.join(aggregates.STATS)}."}, status=400)
+        try:
+            year_min = int(params["year_min"]) if params.get("year_min") else None
+            year_max = int(params["year_max"]) if params.get("year_max") else None
+            top = int(params.get("top", 20))
+            window = int(params.get("window", 5))
+            q = [float(p) for p in params.get("q", "10,25,50,75,90").split(",") if p.strip()]
+        except ValueError:
+            return Response({"detail": "year_min, year_max, top, window and q must be numbers."}, status=400)
+        if top < 1 or window < 1 or not q or not all(0 <= p <= 100 for p in q):
+            return Response({"detail": "top and window must be positive; q must lie in [0, 100]."}, status=400)
+
+        year = params.get("year")
+        try:
+            year = int(year) if year else None
+        except ValueError:
+            return Response({"detail": "year must be an integer."}, status=400)
+
+        isos = [c.strip() for c in params.get("countries", "").split(",") if c.strip()]
+        result = aggregates.aggregate(
+            stat, code, year_min, year_max, isos, year=year,
+            top=top if params.get("top") else None, window=window, q=q,
+        )
+        return Response({"indicator": code, "stat": stat, **result})
 
 
 class DashboardViewSet(viewsets.ModelViewSet):
     serializer_class = DashboardSerializer
     permission_classes = [permissions.IsAuthenticated]
     def get_queryset(self):
-        return Dashboard.objects.filter(owner=self.request.user)
+        return Dashboard.objects.filter(owner=self.request.user).prefetch_related(
+            Prefetch('items', queryset=DashboardChart.objects.select_related('chart'))
+        )
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    @action(detail=True, methods=['get'], url_path='render')
+    def render_charts(self, request, pk=None):
+        """
+        Every chart on the dashboard, in order, with its series as
+        charts/{id}/data/ would return it (?layout=columnar as there).
+        """
+        layout = request.query_params.get('layout', 'tidy')
+        if layout not in ('tidy', 'columnar'):
+            return Response({'detail': "layout must be 'tidy' or 'columnar'."}, status=400)
+        dashboard = self.get_object()
+        charts = [item.chart for item in dashboard.items.all()]
+        version, _ = dataset_version(OBSERVATIONS)
+        fmt = getattr(request.accepted_renderer, 'format', '')
+        return Response({
+            'id': dashboard.id,
+            'name': dashboard.name,
+            'charts': dashboards.render(charts, layout, fmt, version),
+        })
+
 
 class ChartViewSet(viewsets.ModelViewSet):
-    queryset = Chart.objects.all()
+    """
+    Saved charts. The list is slim (ChartListSerializer, newest first, keyset
+    paginated); the full config comes with the detail view.
+    """
+    queryset = Chart.objects.select_related('owner')
     serializer_class = ChartSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = ChartPagination
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action == 'list':
+            qs = qs.only('id', 'name', 'updated', 'config_hash', 'owner__username')
         if self.request.query_params.get('mine') and self.request.user.is_authenticated:
             qs = qs.filter(owner=self.request.user)
         return qs
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ChartListSerializer
+        return super().get_serializer_class()
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -165,4 +369,30 @@ class ChartViewSet(viewsets.ModelViewSet):
             defaults={'config': config}
         )
         data = self.get_serializer(obj).data
-        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
\ No newline at end of file
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def data(self, request, pk=None):
+        """
+        The chart's series in one request, in the same shapes as
+        observations/timeseries/ (tidy by default, ?layout=columnar) plus the
+        normalized config. Cached by config hash and dataset version, so
+        every chart with the same config shares one entry.
+        """
+        chart = self.get_object()
+        layout = request.query_params.get('layout', 'tidy')
+        if layout not in ('tidy', 'columnar'):
+            return Response({'detail': "layout must be 'tidy' or 'columnar'."}, status=400)
+        try:
+            config = normalize_config(chart.config)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=400)
+
+        def compute():
+            span = config['range']
+            columnar = columnar_series(config['country'], config['metrics'], span['start'], span['end'])
+            return chart_payload(config, columnar, layout)
+
+        version, last_modified = dataset_version(OBSERVATIONS)
+        key = data_key(config, layout, getattr(request.accepted_renderer, 'format', ''), version)
+        return keyed_response(request, key, last_modified, compute)
\ No newline at end of file
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +49,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # gzip/brotli; above everything else that reads or writes the body
+    'emissions.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,12 +83,102 @@ WSGI_APPLICATION = 'true_footprint.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DJANGO_DB_ENGINE=postgresql reads the POSTGRES_* variables below. The
+# default is the local SQLite file, in WAL mode so API reads keep going
+# while a loader writes.
+
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'true_footprint'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DJANGO_DB_POOL', '') == '1':
+        # psycopg 3 connection pool (Django >= 5.1); incompatible with CONN_MAX_AGE
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX', 10)),
+                'timeout': 10,
+            },
+        }
+    else:
+        # Persistent connections, checked before reuse
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60))
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # seconds to wait on a locked database before raising
+                'timeout': 20,
+                # take the write lock at BEGIN so writers queue on the busy
+                # timeout instead of failing when upgrading a read lock
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA mmap_size=268435456;'
+                    'PRAGMA cache_size=-65536;'
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DJANGO_DB_ENGINE must be 'sqlite' or 'postgresql', not {DB_ENGINE!r}")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Backs the data API response cache (emissions/cache.py). Local-memory
+# (LRU, per process) by default; set DJANGO_CACHE_BACKEND=file or redis with
+# DJANGO_CACHE_LOCATION to share it between workers.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'locmem')
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'true-footprint'),
     }
 }
+if CACHE_BACKEND != 'redis':
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 1000}
+
+# Larger response payloads are served uncached; with MAX_ENTRIES above,
+# a LocMemCache holds at most about 256 MB per worker process
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('DJANGO_RESPONSE_CACHE_MAX_BYTES', 256 * 1024))
+
+# Seconds a worker may serve a dataset version it cannot see the loader bump
+DATASET_VERSION_TTL = 30
+RESPONSE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Serve time-series, summary and aggregate reads from an in-process NumPy
+# cube of all observations (emissions/cube.py), rebuilt per dataset version
+INDICATOR_CUBE = os.environ.get('DJANGO_INDICATOR_CUBE', '') == '1'
+# Snapshot file the loaders write and every worker mmaps, so they share one
+# copy of the cube; empty builds it per process from the database
+INDICATOR_SNAPSHOT = os.environ.get('DJANGO_INDICATOR_SNAPSHOT', '')
+
+# Threads per process that run a dashboard render's per-country queries
+DASHBOARD_RENDER_WORKERS = int(os.environ.get('DJANGO_DASHBOARD_RENDER_WORKERS', 4))
 
 
 # Password validation
@@ -129,7 +224,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'emissions.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -139,6 +234,9 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Seconds an access token's user is served from the cache (CachedJWTAuthentication)
+AUTH_CACHE_TTL = 60
+
 
 CORS_ALLOW_ALL_ORIGINS = True
 